@@ -1,10 +1,15 @@
 import os
 from app import create_app, db
+from app.services import start_service_warmup
 from app.models import ChatSession, ChatMessage, Application, Document, UniversityInfo
 
 # Create Flask application
 app = create_app(os.getenv('FLASK_ENV') or 'default')
 
+# Lambda containers serve requests once imported; load the models before the first one
+if os.environ.get('AWS_LAMBDA_FUNCTION_NAME'):
+    start_service_warmup(app)
+
 @app.shell_context_processor
 def make_shell_context():
     """Make database models available in Flask shell."""
@@ -46,4 +51,7 @@ def setup_university():
         print("University information already exists.")
 
 if __name__ == '__main__':
+    # With the reloader, only the child process serves requests
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_service_warmup(app)
     app.run(debug=True) 
\ No newline at end of file
@@ -1,14 +1,45 @@
 from flask import Flask
+from flask.json.provider import JSONProvider
 from flask_sqlalchemy import SQLAlchemy
 from flask_cors import CORS
 from config import config
 import os
+import decimal
+from concurrent.futures import ThreadPoolExecutor
+import orjson
 from flask_migrate import Migrate
 
 # Initialize extensions
 db = SQLAlchemy()
 migrate = Migrate()
 
+def _orjson_default(o):
+    """Serialize the few types orjson doesn't handle natively."""
+    if isinstance(o, decimal.Decimal):
+        return str(o)
+    if hasattr(o, '__html__'):
+        return str(o.__html__())
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+ORJSON_OPTIONS = orjson.OPT_NAIVE_UTC | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+class ORJSONProvider(JSONProvider):
+    """JSON provider backed by orjson, used by jsonify and request.get_json."""
+    
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=_orjson_default, option=ORJSON_OPTIONS).decode()
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+    
+    def response(self, *args, **kwargs):
+        # Hand orjson's bytes straight to the response instead of round-tripping through str
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(
+            orjson.dumps(obj, default=_orjson_default, option=ORJSON_OPTIONS),
+            mimetype='application/json'
+        )
+
 def create_app(config_name=None):
     """Application factory pattern for creating Flask app instances."""
     
@@ -16,6 +47,7 @@ def create_app(config_name=None):
         config_name = os.environ.get('FLASK_ENV') or 'default'
     
     app = Flask(__name__)
+    app.json = ORJSONProvider(app)
     app.config.from_object(config[config_name])
     config[config_name].init_app(app)
     
@@ -24,6 +56,27 @@ def create_app(config_name=None):
     migrate.init_app(app, db)
     CORS(app)
     
+    # Construct heavy services in the background so first requests don't pay for it
+    from app.services import init_services
+    init_services(app)
+    
+    # Recent RAG answers and program extractions, reused for repeated messages
+    from app.services.cache import TTLCache
+    app.extensions['rag_response_cache'] = TTLCache(
+        maxsize=app.config['RAG_RESPONSE_CACHE_SIZE'],
+        ttl=app.config['RAG_RESPONSE_CACHE_TTL']
+    )
+    app.extensions['program_extraction_cache'] = TTLCache(
+        maxsize=app.config['PROGRAM_EXTRACTION_CACHE_SIZE'],
+        ttl=app.config['PROGRAM_EXTRACTION_CACHE_TTL']
+    )
+    
+    # Worker pool for document processing off the request thread
+    app.extensions['executor'] = ThreadPoolExecutor(
+        max_workers=app.config['DOCUMENT_WORKERS'],
+        thread_name_prefix='document-worker'
+    )
+    
     # Register blueprints
     from app.api import api_bp
     app.register_blueprint(api_bp, url_prefix='/api')
@@ -34,14 +87,8 @@ def create_app(config_name=None):
     from app.admin import admin_bp
     app.register_blueprint(admin_bp, url_prefix='/api/admin')
     
-    # Create upload directory if it doesn't exist
-    upload_folder = app.config['UPLOAD_FOLDER']
-    if not os.path.exists(upload_folder):
-        os.makedirs(upload_folder)
-    
-    # Create vector database directory if it doesn't exist
-    vector_db_path = app.config['VECTOR_DB_PATH']
-    if not os.path.exists(vector_db_path):
-        os.makedirs(vector_db_path)
+    # Create upload and vector database directories if they don't exist
+    os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+    os.makedirs(app.config['VECTOR_DB_PATH'], exist_ok=True)
     
     return app 
\ No newline at end of file
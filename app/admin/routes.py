@@ -1,43 +1,98 @@
 from flask import request, jsonify
+from sqlalchemy import select, func
+from sqlalchemy.orm import load_only
 from app.admin import admin_bp
 from app.models import Application, ChatSession
+from app.pagination import get_page_args, keyset_page
+from app.sql_functions import iso_timestamp
 from app import db
 import logging
 
+logger = logging.getLogger(__name__)
+
 @admin_bp.route('/applications', methods=['GET'])
 def list_applications():
-    """List all applications for university representatives."""
+    """List applications for university representatives, newest first, one page at a time."""
     try:
-        applications = Application.query.order_by(Application.submitted_at.desc()).all()
+        try:
+            limit, cursor = get_page_args()
+        except ValueError:
+            return jsonify({'error': 'Invalid pagination parameters'}), 400
+        
+        # Select only the listed columns to skip full ORM hydration
+        rows, next_cursor = keyset_page(
+            select(
+                Application.id,
+                Application.first_name,
+                Application.last_name,
+                Application.email,
+                Application.phone,
+                Application.program_interest,
+                Application.status,
+                iso_timestamp(Application.submitted_at).label('submitted_at'),
+                iso_timestamp(Application.updated_at).label('updated_at')
+            ),
+            Application.submitted_at,
+            Application.id,
+            limit,
+            cursor
+        )
         
-        application_list = []
-        for app in applications:
-            application_list.append({
-                'id': app.id,
-                'first_name': app.first_name,
-                'last_name': app.last_name,
-                'email': app.email,
-                'phone': app.phone,
-                'program_interest': app.program_interest,
-                'status': app.status.value if app.status else 'pending',
-                'submitted_at': app.submitted_at.isoformat(),
-                'updated_at': app.updated_at.isoformat()
-            })
+        application_list = [{
+            'id': row.id,
+            'first_name': row.first_name,
+            'last_name': row.last_name,
+            'email': row.email,
+            'phone': row.phone,
+            'program_interest': row.program_interest,
+            'status': row.status.value if row.status else 'pending',
+            'submitted_at': row.submitted_at,
+            'updated_at': row.updated_at
+        } for row in rows]
         
         return jsonify({
             'applications': application_list,
-            'total_count': len(application_list)
+            'total_count': db.session.scalar(select(func.count()).select_from(Application)),
+            'next_cursor': next_cursor
         })
         
     except Exception as e:
-        logging.error(f"Error listing applications: {str(e)}")
+        logger.exception("Error listing applications: %s", e)
         return jsonify({'error': 'Failed to retrieve applications'}), 500
 
 @admin_bp.route('/applications/<application_id>', methods=['GET'])
 def get_application_details(application_id):
     """Get detailed information about a specific application."""
     try:
-        application = Application.query.get(application_id)
+        # Load only the serialized columns
+        application = db.session.execute(
+            select(Application).options(load_only(
+                Application.id,
+                Application.first_name,
+                Application.last_name,
+                Application.email,
+                Application.phone,
+                Application.date_of_birth,
+                Application.address_line1,
+                Application.address_line2,
+                Application.city,
+                Application.state,
+                Application.postal_code,
+                Application.country,
+                Application.program_interest,
+                Application.previous_education,
+                Application.gpa,
+                Application.test_scores,
+                Application.status,
+                Application.agent_notes,
+                Application.missing_information,
+                Application.admin_notes,
+                Application.reviewed_by,
+                Application.reviewed_at,
+                Application.submitted_at,
+                Application.updated_at
+            )).where(Application.id == application_id)
+        ).scalar_one_or_none()
         if not application:
             return jsonify({'error': 'Application not found'}), 404
         
@@ -75,5 +130,5 @@ def get_application_details(application_id):
         })
         
     except Exception as e:
-        logging.error(f"Error getting application details: {str(e)}")
+        logger.exception("Error getting application details: %s", e)
         return jsonify({'error': 'Failed to retrieve application details'}), 500 
\ No newline at end of file
@@ -1,63 +1,208 @@
-from flask import request, jsonify, current_app
+from flask import request, jsonify, current_app, Response
 from werkzeug.utils import secure_filename
+from sqlalchemy import select, func, case, update, or_
+from sqlalchemy.exc import IntegrityError
 import os
+import threading
 import uuid
-from datetime import datetime
+import hashlib
+from datetime import datetime, timedelta
 from app.api import api_bp
-from app.models import Document, UniversityInfo
-from app.services.rag_service import RAGService
+from app.models import Document, utc_now
+from app.services import get_service
+from app.services.cache import get_cached_university
+from app.pagination import get_page_args, keyset_page
+from app.sql_functions import iso_timestamp
 from app import db
 import logging
 
-# Initialize RAG service
-rag_service = None
+logger = logging.getLogger(__name__)
+
+# Bytes read per iteration when streaming uploads to disk
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Health payload is fixed apart from the timestamp, which is spliced in per call
+_HEALTH_HEAD = b'{"status":"healthy","timestamp":"'
+_HEALTH_TAIL = b'","version":"1.0.0"}\n'
 
 def get_rag_service():
-    """Get or create RAG service instance."""
-    global rag_service
-    if rag_service is None:
-        rag_service = RAGService()
-    return rag_service
+    """Get the shared RAG service instance."""
+    return get_service('rag')
+
+def _touch_document(document_id, processing_token):
+    """Refresh an unprocessed document's heartbeat; False once another run has taken it over."""
+    claimed = db.session.execute(
+        update(Document)
+        .where(
+            Document.id == document_id,
+            Document.processing_token == processing_token,
+            Document.is_processed.is_(False)
+        )
+        .values(updated_at=utc_now()),
+        execution_options={'synchronize_session': False}
+    ).rowcount
+    db.session.commit()
+    return bool(claimed)
+
+def _keep_document_claimed(app, document_id, processing_token, stop):
+    """Heartbeat a document while it is processed, so re-uploads don't take it over as stale."""
+    interval = app.config['DOCUMENT_PROCESSING_TIMEOUT'] / 3
+    with app.app_context():
+        while not stop.wait(interval):
+            try:
+                if not _touch_document(document_id, processing_token):
+                    return
+            except Exception as e:
+                db.session.rollback()
+                logger.exception("Error refreshing document %s heartbeat: %s", document_id, e)
+
+def _process_document(app, document_id, file_path, metadata, processing_token):
+    """Embed an uploaded document, discarding it if processing fails."""
+    with app.app_context():
+        # A job that waited in the queue past the timeout may have been taken over
+        if not _touch_document(document_id, processing_token):
+            logger.warning("Skipping document %s, taken over by another processing run", document_id)
+            return False
+        
+        stop = threading.Event()
+        threading.Thread(
+            target=_keep_document_claimed,
+            args=(app, document_id, processing_token, stop),
+            daemon=True
+        ).start()
+        
+        try:
+            success = get_rag_service().process_pdf_document(
+                file_path=file_path,
+                document_id=document_id,
+                metadata=metadata,
+                processing_token=processing_token
+            )
+            if success:
+                return True
+            logger.error("Processing failed for document %s", document_id)
+        except Exception as e:
+            logger.exception("Error processing document %s: %s", document_id, e)
+        finally:
+            stop.set()
+        
+        _discard_document(document_id, file_path, processing_token)
+        return False
+
+def _start_document_processing(document, message):
+    """Process a document and build the upload response.
+    
+    Normally the work goes to the background executor and clients poll /documents.
+    Where background threads don't survive the response (AWS Lambda freezes the
+    container), it runs inline and the response reports the outcome.
+    """
+    document_id = document.id
+    filename = document.original_filename
+    args = (
+        current_app._get_current_object(),
+        document_id,
+        document.file_path,
+        {
+            'title': document.title,
+            'category': document.category,
+            'original_filename': filename
+        },
+        document.processing_token
+    )
+    
+    if current_app.config['PROCESS_UPLOADS_IN_BACKGROUND']:
+        current_app.extensions['executor'].submit(_process_document, *args)
+        return jsonify({
+            'message': message,
+            'document_id': document_id,
+            'filename': filename
+        }), 202
+    
+    if _process_document(*args):
+        return jsonify({
+            'message': 'Document uploaded and processed successfully',
+            'document_id': document_id,
+            'filename': filename
+        }), 201
+    
+    # The failed document has been discarded, so there is no ID to return
+    return jsonify({'error': 'Document uploaded but processing failed'}), 500
+
+def _discard_document(document_id, file_path, processing_token):
+    """Remove a document whose processing failed so the same file can be uploaded again."""
+    try:
+        db.session.rollback()
+        # A run that was taken over leaves the row, file and chunks to the new owner
+        deleted = Document.query.filter_by(id=document_id, processing_token=processing_token).delete()
+        db.session.commit()
+        if not deleted:
+            return
+        
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        
+        get_rag_service().delete_document_chunks(document_id)
+        
+    except Exception as e:
+        db.session.rollback()
+        logger.exception("Error discarding failed document %s: %s", document_id, e)
+
+def _already_uploaded_response(existing):
+    """Response for an upload whose contents match an existing document."""
+    if existing.is_processed:
+        return jsonify({
+            'message': 'Document already uploaded',
+            'document_id': existing.id,
+            'filename': existing.original_filename
+        }), 200
+    return jsonify({
+        'message': 'Document already uploaded, processing in progress',
+        'document_id': existing.id,
+        'filename': existing.original_filename
+    }), 202
 
 @api_bp.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint."""
-    return jsonify({
-        'status': 'healthy',
-        'timestamp': datetime.utcnow().isoformat(),
-        'version': '1.0.0'
-    })
+    body = _HEALTH_HEAD + datetime.utcnow().isoformat().encode() + _HEALTH_TAIL
+    return Response(body, mimetype='application/json')
 
 @api_bp.route('/university-info', methods=['GET'])
 def get_university_info():
     """Get university information."""
     try:
         # Get the first university info record (assuming single university setup)
-        university = UniversityInfo.query.first()
+        university = get_cached_university()
         
         if not university:
             return jsonify({
                 'error': 'University information not configured'
             }), 404
         
-        return jsonify({
-            'university_name': university.university_name,
-            'university_code': university.university_code,
-            'contact_email': university.contact_email,
-            'contact_phone': university.contact_phone,
-            'website': university.website,
-            'address': university.address,
-            'welcome_message': university.welcome_message,
-            'application_deadline': university.application_deadline.isoformat() if university.application_deadline else None
-        })
+        # Reuse the serialized body for as long as the cached snapshot is unchanged
+        cached = current_app.extensions.get('uni_info_json')
+        if cached is None or cached[0] is not university:
+            body = current_app.json.dumps({
+                'university_name': university['university_name'],
+                'university_code': university['university_code'],
+                'contact_email': university['contact_email'],
+                'contact_phone': university['contact_phone'],
+                'website': university['website'],
+                'address': university['address'],
+                'welcome_message': university['welcome_message'],
+                'application_deadline': university['application_deadline'].isoformat() if university['application_deadline'] else None
+            }).encode()
+            cached = current_app.extensions['uni_info_json'] = (university, body)
+        
+        return Response(cached[1], mimetype='application/json')
         
     except Exception as e:
-        logging.error(f"Error getting university info: {str(e)}")
+        logger.exception("Error getting university info: %s", e)
         return jsonify({'error': 'Failed to retrieve university information'}), 500
 
 @api_bp.route('/upload-document', methods=['POST'])
 def upload_document():
-    """Upload and process a PDF document for RAG."""
+    """Upload a PDF document and queue it for RAG processing."""
     try:
         # Check if file is present in request
         if 'file' not in request.files:
@@ -81,17 +226,62 @@ def upload_document():
         original_filename = secure_filename(file.filename)
         unique_filename = f"{uuid.uuid4()}_{original_filename}"
         
-        # Ensure upload directory exists
+        # Upload directory is created by create_app
         upload_folder = current_app.config['UPLOAD_FOLDER']
-        if not os.path.exists(upload_folder):
-            os.makedirs(upload_folder)
         
-        # Save file
+        # Save file in fixed-size chunks, hashing and measuring it in the same pass
         file_path = os.path.join(upload_folder, unique_filename)
-        file.save(file_path)
+        file_hash = hashlib.sha256()
+        file_size = 0
+        with open(file_path, 'wb') as out:
+            while True:
+                buffer = file.stream.read(UPLOAD_CHUNK_SIZE)
+                if not buffer:
+                    break
+                out.write(buffer)
+                file_hash.update(buffer)
+                file_size += len(buffer)
+        file_hash = file_hash.hexdigest()
+        
+        # Identical content was already uploaded; don't store or embed it twice
+        existing = Document.query.filter_by(file_hash=file_hash).first()
         
-        # Get file size
-        file_size = os.path.getsize(file_path)
+        if existing and not existing.is_processed:
+            # Unprocessed: either still in progress, or its worker died before finishing.
+            # Live runs keep updated_at fresh, so only a stale row is taken over; the new
+            # token makes the old run (if it is somehow alive) leave the row alone.
+            cutoff = utc_now() - timedelta(seconds=current_app.config['DOCUMENT_PROCESSING_TIMEOUT'])
+            processing_token = str(uuid.uuid4())
+            values = {'processing_token': processing_token, 'updated_at': utc_now()}
+            keep_existing_file = os.path.exists(existing.file_path)
+            if not keep_existing_file:
+                values.update(filename=unique_filename, file_path=file_path)
+            
+            claimed = db.session.execute(
+                update(Document)
+                .where(
+                    Document.id == existing.id,
+                    Document.is_processed.is_(False),
+                    or_(Document.updated_at.is_(None), Document.updated_at < cutoff)
+                )
+                .values(**values),
+                execution_options={'synchronize_session': False}
+            ).rowcount
+            db.session.commit()
+            
+            if claimed:
+                logger.warning("Reprocessing stale unprocessed document %s", existing.id)
+                if keep_existing_file:
+                    os.remove(file_path)
+                
+                # Drop any chunks the interrupted run had already stored
+                get_rag_service().delete_document_chunks(existing.id)
+                
+                return _start_document_processing(existing, 'Document uploaded, processing restarted')
+        
+        if existing:
+            os.remove(file_path)
+            return _already_uploaded_response(existing)
         
         # Create document record
         document = Document(
@@ -100,78 +290,76 @@ def upload_document():
             file_path=file_path,
             file_size=file_size,
             file_type='pdf',
+            file_hash=file_hash,
+            processing_token=str(uuid.uuid4()),
             title=title if title else original_filename,
             description=description,
             category=category
         )
         
         db.session.add(document)
-        db.session.commit()
-        
-        # Process document asynchronously (for now, synchronously)
         try:
-            rag_service = get_rag_service()
-            success = rag_service.process_pdf_document(
-                file_path=file_path,
-                document_id=document.id,
-                metadata={
-                    'title': document.title,
-                    'category': document.category,
-                    'original_filename': document.original_filename
-                }
-            )
-            
-            if success:
-                return jsonify({
-                    'message': 'Document uploaded and processed successfully',
-                    'document_id': document.id,
-                    'filename': original_filename
-                }), 201
-            else:
-                return jsonify({
-                    'error': 'Document uploaded but processing failed',
-                    'document_id': document.id
-                }), 500
-                
-        except Exception as processing_error:
-            logging.error(f"Error processing document: {str(processing_error)}")
-            return jsonify({
-                'error': 'Document uploaded but processing failed',
-                'document_id': document.id,
-                'details': str(processing_error)
-            }), 500
+            db.session.commit()
+        except IntegrityError:
+            # A concurrent upload of the same file inserted it first
+            db.session.rollback()
+            os.remove(file_path)
+            return _already_uploaded_response(Document.query.filter_by(file_hash=file_hash).one())
+        
+        return _start_document_processing(document, 'Document uploaded, processing started')
         
     except Exception as e:
-        logging.error(f"Error uploading document: {str(e)}")
+        logger.exception("Error uploading document: %s", e)
         return jsonify({'error': 'Failed to upload document'}), 500
 
 @api_bp.route('/documents', methods=['GET'])
 def list_documents():
-    """List all uploaded documents."""
+    """List uploaded documents, newest first, one page at a time."""
     try:
-        documents = Document.query.order_by(Document.uploaded_at.desc()).all()
-        
-        document_list = []
-        for doc in documents:
-            document_list.append({
-                'id': doc.id,
-                'title': doc.title,
-                'original_filename': doc.original_filename,
-                'category': doc.category,
-                'file_size': doc.file_size,
-                'is_processed': doc.is_processed,
-                'chunk_count': doc.chunk_count,
-                'uploaded_at': doc.uploaded_at.isoformat(),
-                'processed_at': doc.processed_at.isoformat() if doc.processed_at else None
-            })
+        try:
+            limit, cursor = get_page_args()
+        except ValueError:
+            return jsonify({'error': 'Invalid pagination parameters'}), 400
+        
+        # Select only the listed columns to skip full ORM hydration
+        rows, next_cursor = keyset_page(
+            select(
+                Document.id,
+                Document.title,
+                Document.original_filename,
+                Document.category,
+                Document.file_size,
+                Document.is_processed,
+                Document.chunk_count,
+                iso_timestamp(Document.uploaded_at).label('uploaded_at'),
+                iso_timestamp(Document.processed_at).label('processed_at')
+            ),
+            Document.uploaded_at,
+            Document.id,
+            limit,
+            cursor
+        )
+        
+        document_list = [{
+            'id': row.id,
+            'title': row.title,
+            'original_filename': row.original_filename,
+            'category': row.category,
+            'file_size': row.file_size,
+            'is_processed': row.is_processed,
+            'chunk_count': row.chunk_count,
+            'uploaded_at': row.uploaded_at,
+            'processed_at': row.processed_at
+        } for row in rows]
         
         return jsonify({
             'documents': document_list,
-            'total_count': len(document_list)
+            'total_count': db.session.scalar(select(func.count()).select_from(Document)),
+            'next_cursor': next_cursor
         })
         
     except Exception as e:
-        logging.error(f"Error listing documents: {str(e)}")
+        logger.exception("Error listing documents: %s", e)
         return jsonify({'error': 'Failed to retrieve documents'}), 500
 
 @api_bp.route('/documents/<document_id>', methods=['DELETE'])
@@ -198,7 +386,7 @@ def delete_document(document_id):
         return jsonify({'message': 'Document deleted successfully'})
         
     except Exception as e:
-        logging.error(f"Error deleting document: {str(e)}")
+        logger.exception("Error deleting document: %s", e)
         return jsonify({'error': 'Failed to delete document'}), 500
 
 @api_bp.route('/vector-stats', methods=['GET'])
@@ -208,9 +396,14 @@ def get_vector_stats():
         rag_service = get_rag_service()
         stats = rag_service.get_collection_stats()
         
-        # Also get database stats
-        total_documents = Document.query.count()
-        processed_documents = Document.query.filter_by(is_processed=True).count()
+        # Also get database stats (both counts in one query)
+        total_documents, processed_documents = db.session.execute(
+            select(
+                func.count(),
+                func.sum(case((Document.is_processed == True, 1), else_=0))
+            ).select_from(Document)
+        ).one()
+        processed_documents = processed_documents or 0
         
         return jsonify({
             'vector_database': stats,
@@ -222,5 +415,5 @@ def get_vector_stats():
         })
         
     except Exception as e:
-        logging.error(f"Error getting vector stats: {str(e)}")
+        logger.exception("Error getting vector stats: %s", e)
         return jsonify({'error': 'Failed to retrieve statistics'}), 500 
\ No newline at end of file
@@ -1,26 +1,195 @@
-from flask import request, jsonify, current_app
+from flask import request, jsonify, current_app, Response, stream_with_context
 import uuid
-from datetime import datetime
+import hashlib
+from datetime import datetime, timezone
+from sqlalchemy import select, insert
 from app.chat import chat_bp
-from app.models import ChatSession, ChatMessage, UniversityInfo, ApplicantData
-from app.services.gemini_service import GeminiService
-from app.services.rag_service import RAGService
+from app.models import ChatSession, ChatMessage, ApplicantData
+from app.services import get_service
+from app.services.cache import get_cached_university, request_cached
 from app import db
 import logging
 import re
+import orjson
 
-# Initialize services
-gemini_service = None
-rag_service = None
+logger = logging.getLogger(__name__)
+
+EMAIL_RE = re.compile(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}\b')
+
+# Application keywords, matched as substrings like the original keyword list
+# ('how to apply', 'enrollment', 'admission process', etc. are covered by these)
+INTENT_RE = re.compile(r'apply|application|enroll|admission|register', re.IGNORECASE)
+
+# Program patterns checked before the AI extraction, tried in order against the lowercased message
+PROGRAM_PATTERNS = tuple(re.compile(pattern) for pattern in (
+    r'apply.*?for.*?(cybersecurity.*?program)',
+    r'apply.*?for.*?(computer science.*?program)',
+    r'apply.*?for.*?(engineering.*?program)',
+    r'apply.*?for.*?(business.*?program)',
+    r'interested in.*?(cybersecurity.*?program)',
+    r'interested in.*?(computer science.*?program)',
+    r'enroll.*?in.*?(cybersecurity.*?program)',
+    r'(cybersecurity program)',
+    r'(computer science program)',
+))
+
+# Program extraction prompt, split around the quoted user message
+EXTRACTION_PROMPT_PREFIX = """
+Extract the academic program the user is interested in from this message. Return ONLY a JSON object:
+
+Message: \""""
+EXTRACTION_PROMPT_SUFFIX = """\"
+
+Extract:
+- intended_program: The specific academic program they want to apply for
+
+Rules:
+- Only extract if user shows clear intent to apply or enroll
+- Look for program names, degrees, or fields of study
+- Format as "Program Name" (e.g., "Cybersecurity Program", "Computer Science Program")
+- Return null if no program is mentioned
+
+Return format: {"intended_program": "value or null"}
+"""
+
+CONFIRMATION_TEMPLATE = """
+✅ **Application Intent Recorded!**
+
+Thank you for your interest in applying to **{program}**! I've recorded your application intent and your information:
+
+👤 **Your Details:**
+• Name: {name}
+• Email: {email}
+• Phone: {phone}
+• Program: {program}
+
+Now let me provide you with specific information about this program and the application process.
+
+"""
 
 def get_services():
-    """Get or create service instances."""
-    global gemini_service, rag_service
-    if gemini_service is None:
-        gemini_service = GeminiService()
-    if rag_service is None:
-        rag_service = RAGService()
-    return gemini_service, rag_service
+    """Get the shared service instances."""
+    return get_service('gemini'), get_service('rag')
+
+def rag_cache_key(query, context_documents):
+    """Key a RAG answer by the normalized question and the retrieved context."""
+    normalized_query = ' '.join(query.lower().split())
+    return hashlib.sha1(
+        '\x00'.join([normalized_query] + sorted(context_documents)).encode()
+    ).hexdigest()
+
+def generate_cached_rag_response(gemini_service, query, context_documents, use_cache=True):
+    """Generate a RAG response, reusing a recent answer to the same question over the same context."""
+    cache = current_app.extensions['rag_response_cache']
+    key = rag_cache_key(query, context_documents)
+    
+    if use_cache:
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+    
+    response = gemini_service.generate_rag_response(
+        query=query,
+        context_documents=context_documents
+    )
+    
+    # Don't pin fallback apologies in the cache
+    if 'error' not in response:
+        cache.set(key, response)
+    
+    return response
+
+def stream_message_response(gemini_service, query, context_documents, user_row,
+                            applicant_data=None, confirmation_message='', use_cache=True):
+    """
+    Stream the assistant reply as NDJSON and save both messages once it completes.
+    
+    Emits {"type": "chunk", "text": ...} lines, then a final {"type": "done", ...} line
+    with the saved message details, or {"type": "error", ...} if generation fails.
+    """
+    cache = current_app.extensions['rag_response_cache']
+    key = rag_cache_key(query, context_documents)
+    
+    def line(obj):
+        return current_app.json.dumps(obj) + '\n'
+    
+    def generate():
+        parts = []
+        try:
+            if confirmation_message:
+                parts.append(confirmation_message)
+                yield line({'type': 'chunk', 'text': confirmation_message})
+            
+            rag_response = cache.get(key) if use_cache else None
+            if rag_response is not None:
+                parts.append(rag_response['text'])
+                yield line({'type': 'chunk', 'text': rag_response['text']})
+            else:
+                stream = gemini_service.stream_rag_response(
+                    query=query,
+                    context_documents=context_documents
+                )
+                rag_parts = []
+                for text in stream['chunks']:
+                    rag_parts.append(text)
+                    yield line({'type': 'chunk', 'text': text})
+                
+                rag_response = {
+                    'text': ''.join(rag_parts),
+                    'sources': stream['sources'],
+                    'confidence': stream['confidence']
+                }
+                cache.set(key, rag_response)
+                parts.extend(rag_parts)
+            
+            assistant_row = {
+                'id': str(uuid.uuid4()),
+                'session_id': user_row['session_id'],
+                'message_type': 'assistant',
+                'content': ''.join(parts),
+                'timestamp': datetime.now(timezone.utc),
+                'source_documents': rag_response.get('sources', []),
+                'confidence_score': rag_response.get('confidence', 0.0)
+            }
+            
+            applicant_snapshot = applicant_data.to_dict() if applicant_data else None
+            
+            db.session.execute(insert(ChatMessage), [user_row, assistant_row])
+            db.session.commit()
+        
+        except Exception as e:
+            logger.exception("Error streaming message: %s", e)
+            # Keep the user's message in the history even if generation failed
+            db.session.rollback()
+            db.session.execute(insert(ChatMessage), [user_row])
+            db.session.commit()
+            yield line({'type': 'error', 'error': 'Failed to process message'})
+            return
+        
+        done = {
+            'type': 'done',
+            'message_id': assistant_row['id'],
+            'confidence_score': assistant_row['confidence_score']
+        }
+        if applicant_snapshot:
+            done['applicant_data'] = applicant_snapshot
+        yield line(done)
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+@request_cached()
+def get_session_with_applicant(session_id):
+    """Resolve a public session ID to its primary key and applicant data in one query.
+    
+    Returns:
+        (session_pk, applicant_data) tuple, applicant_data may be None; None if the session is unknown
+    """
+    row = db.session.execute(
+        select(ChatSession.id, ApplicantData)
+        .outerjoin(ApplicantData, ApplicantData.session_id == ChatSession.id)
+        .where(ChatSession.session_id == session_id)
+    ).first()
+    return tuple(row) if row else None
 
 @chat_bp.route('/session', methods=['POST'])
 def create_chat_session():
@@ -35,11 +204,11 @@ def create_chat_session():
         db.session.commit()
         
         # Get university welcome message
-        university = UniversityInfo.query.first()
+        university = get_cached_university()
         welcome_message = "Hello! I'm here to help you with information about our university. How can I assist you today?"
         
-        if university and university.welcome_message:
-            welcome_message = university.welcome_message
+        if university and university['welcome_message']:
+            welcome_message = university['welcome_message']
         
         return jsonify({
             'session_id': session_id,
@@ -48,7 +217,7 @@ def create_chat_session():
         }), 201
         
     except Exception as e:
-        logging.error(f"Error creating chat session: {str(e)}")
+        logger.exception("Error creating chat session: %s", e)
         return jsonify({'error': 'Failed to create chat session'}), 500
 
 @chat_bp.route('/applicant-data', methods=['POST'])
@@ -70,15 +239,13 @@ def save_applicant_data():
             }), 400
         
         # Validate email format
-        email_pattern = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
-        if not re.match(email_pattern, data['email']):
+        if not EMAIL_RE.match(data['email']):
             return jsonify({'error': 'Invalid email format'}), 400
         
-        # Create chat session first
+        # Create chat session first (primary key assigned here, so no flush is needed)
         session_id = str(uuid.uuid4())
-        chat_session = ChatSession(session_id=session_id)
+        chat_session = ChatSession(id=str(uuid.uuid4()), session_id=session_id)
         db.session.add(chat_session)
-        db.session.flush()  # Get the session ID without committing
         
         # Create applicant data
         applicant_data = ApplicantData(
@@ -102,7 +269,7 @@ def save_applicant_data():
         
     except Exception as e:
         db.session.rollback()
-        logging.error(f"Error saving applicant data: {str(e)}")
+        logger.exception("Error saving applicant data: %s", e)
         return jsonify({'error': 'Failed to save applicant data'}), 500
 
 @chat_bp.route('/applicant-data/<session_id>', methods=['PUT'])
@@ -113,13 +280,12 @@ def update_applicant_data(session_id):
         if not data:
             return jsonify({'error': 'Request data is required'}), 400
         
-        # Find session
-        session = ChatSession.query.filter_by(session_id=session_id).first()
-        if not session:
+        # Find session and applicant data
+        found = get_session_with_applicant(session_id)
+        if found is None:
             return jsonify({'error': 'Session not found'}), 404
         
-        # Find applicant data
-        applicant_data = ApplicantData.query.filter_by(session_id=session.id).first()
+        _, applicant_data = found
         if not applicant_data:
             return jsonify({'error': 'Applicant data not found'}), 404
         
@@ -128,8 +294,7 @@ def update_applicant_data(session_id):
             applicant_data.name = data['name'].strip()
         if 'email' in data and data['email']:
             # Validate email format
-            email_pattern = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
-            if not re.match(email_pattern, data['email']):
+            if not EMAIL_RE.match(data['email']):
                 return jsonify({'error': 'Invalid email format'}), 400
             applicant_data.email = data['email'].strip().lower()
         if 'phone' in data and data['phone']:
@@ -142,87 +307,69 @@ def update_applicant_data(session_id):
             applicant_data.data_collection_status = 'complete'
         
         applicant_data.updated_at = datetime.now()
+        applicant_snapshot = applicant_data.to_dict()
         db.session.commit()
         
         return jsonify({
             'message': 'Applicant data updated successfully',
-            'applicant_data': applicant_data.to_dict()
+            'applicant_data': applicant_snapshot
         }), 200
         
     except Exception as e:
         db.session.rollback()
-        logging.error(f"Error updating applicant data: {str(e)}")
+        logger.exception("Error updating applicant data: %s", e)
         return jsonify({'error': 'Failed to update applicant data'}), 500
 
 def detect_application_intent(message):
     """Detect if user wants to apply."""
-    application_keywords = [
-        'apply', 'application', 'enroll', 'admission', 'register',
-        'how to apply', 'want to apply', 'interested in applying',
-        'admission process', 'enrollment'
-    ]
-    return any(keyword in message.lower() for keyword in application_keywords)
+    return INTENT_RE.search(message) is not None
+
+def match_program(message):
+    """Match a program name in the message with the local regex patterns."""
+    message_lower = message.lower()
+    for pattern in PROGRAM_PATTERNS:
+        program_match = pattern.search(message_lower)
+        if program_match:
+            program = program_match.group(1).strip().title()
+            if 'program' not in program.lower():
+                program += ' Program'
+            return program
+    
+    return None
 
 def extract_program_info(message, gemini_service=None):
-    """Extract program information from message using AI."""
-    if not gemini_service:
-        return None
+    """Extract program information from message, asking the AI only if the regex finds nothing."""
+    program = match_program(message)
+    if program or not gemini_service:
+        return program
+    
+    # Repeated phrasings skip the model call; cached misses are stored as ''
+    cache = current_app.extensions['program_extraction_cache']
+    key = ' '.join(message.lower().split())
+    cached = cache.get(key)
+    if cached is not None:
+        return cached or None
         
     try:
-        extraction_prompt = f"""
-Extract the academic program the user is interested in from this message. Return ONLY a JSON object:
-
-Message: "{message}"
-
-Extract:
-- intended_program: The specific academic program they want to apply for
-
-Rules:
-- Only extract if user shows clear intent to apply or enroll
-- Look for program names, degrees, or fields of study
-- Format as "Program Name" (e.g., "Cybersecurity Program", "Computer Science Program")
-- Return null if no program is mentioned
-
-Return format: {{"intended_program": "value or null"}}
-"""
+        extraction_prompt = EXTRACTION_PROMPT_PREFIX + message.replace('"', '\\"') + EXTRACTION_PROMPT_SUFFIX
         
         response = gemini_service.model.generate_content(extraction_prompt)
         
         if response and response.text:
-            import json
             try:
-                ai_extracted = json.loads(response.text.strip())
+                ai_extracted = orjson.loads(response.text)
                 program = ai_extracted.get('intended_program')
                 
                 if program and program != 'null':
+                    cache.set(key, program)
                     return program
+                cache.set(key, '')
                         
-            except (json.JSONDecodeError, KeyError) as e:
-                logging.warning(f"Failed to parse AI program extraction: {e}")
+            except (orjson.JSONDecodeError, KeyError) as e:
+                logger.warning("Failed to parse AI program extraction: %s", e)
                 
     except Exception as e:
-        logging.error(f"Error in AI program extraction: {e}")
-    
-    # Fallback regex for program
-    program_patterns = [
-        r'apply.*?for.*?(cybersecurity.*?program)',
-        r'apply.*?for.*?(computer science.*?program)', 
-        r'apply.*?for.*?(engineering.*?program)',
-        r'apply.*?for.*?(business.*?program)',
-        r'interested in.*?(cybersecurity.*?program)',
-        r'interested in.*?(computer science.*?program)',
-        r'enroll.*?in.*?(cybersecurity.*?program)',
-        r'(cybersecurity program)',
-        r'(computer science program)',
-    ]
-    
-    for pattern in program_patterns:
-        program_match = re.search(pattern, message.lower())
-        if program_match:
-            program = program_match.group(1).strip().title()
-            if 'program' not in program.lower():
-                program += ' Program'
-            return program
+        logger.exception("Error in AI program extraction: %s", e)
     
     return None
 
@@ -239,126 +386,143 @@ def send_message(session_id):
         if not user_message:
             return jsonify({'error': 'Message cannot be empty'}), 400
         
-        # Find session
-        session = ChatSession.query.filter_by(session_id=session_id).first()
-        if not session:
+        # Debug switch for a fresh answer, honored only where enabled so public
+        # clients can't force uncached Gemini calls; clients may ask for a streamed reply
+        use_cache = not (current_app.config['ALLOW_RAG_CACHE_BYPASS'] and data.get('no_cache', False))
+        stream = bool(data.get('stream', False))
+        
+        # Find session and its existing applicant data (user data should be pre-saved)
+        found = get_session_with_applicant(session_id)
+        if found is None:
             return jsonify({'error': 'Session not found'}), 404
+        session_pk, applicant_data = found
         
         # Get services
         gemini_svc, rag_svc = get_services()
         
-        # Save user message
-        user_msg = ChatMessage(
-            session_id=session.id,
-            message_type='user',
-            content=user_message
-        )
-        db.session.add(user_msg)
-        db.session.commit()
-        
-        # Get existing applicant data (user data should be pre-saved)
-        applicant_data = ApplicantData.query.filter_by(session_id=session.id).first()
-        
-        # Check for application intent and extract program info
-        has_application_intent = detect_application_intent(user_message)
+        # User message is inserted together with the assistant response
+        user_row = {
+            'id': str(uuid.uuid4()),
+            'session_id': session_pk,
+            'message_type': 'user',
+            'content': user_message,
+            'timestamp': datetime.now(timezone.utc),
+            'source_documents': None,
+            'confidence_score': None
+        }
         
-        # Check if application intent was captured and generate appropriate response
-        application_recorded = False
-        if has_application_intent and applicant_data and not applicant_data.intended_program:
-            # Extract program information using AI
-            program = extract_program_info(user_message, gemini_svc)
+        try:
+            # Check for application intent and extract program info
+            has_application_intent = detect_application_intent(user_message)
             
-            if program:
-                applicant_data.intended_program = program
-                applicant_data.application_status = 'applying'
-                applicant_data.data_collection_status = 'complete'
-                db.session.commit()
-                application_recorded = True
+            # Check if application intent was captured and generate appropriate response
+            application_recorded = False
+            if has_application_intent and applicant_data and not applicant_data.intended_program:
+                # Extract program information using AI
+                program = extract_program_info(user_message, gemini_svc)
                 
-                logging.info(f"Updated applicant program intent: {applicant_data.intended_program} for session {session_id}")
-        
-        # Get relevant context from RAG
-        context_documents = rag_svc.get_relevant_context(user_message)
-        
-        # Generate response with application confirmation if needed
-        if application_recorded:
-            # Generate a response that confirms application intent and provides program info
-            confirmation_message = f"""
-✅ **Application Intent Recorded!**
-
-Thank you for your interest in applying to **{applicant_data.intended_program}**! I've recorded your application intent and your information:
-
-👤 **Your Details:**
-• Name: {applicant_data.name}
-• Email: {applicant_data.email}
-• Phone: {applicant_data.phone}
-• Program: {applicant_data.intended_program}
-
-Now let me provide you with specific information about this program and the application process.
-
-"""
+                if program:
+                    applicant_data.intended_program = program
+                    applicant_data.application_status = 'applying'
+                    applicant_data.data_collection_status = 'complete'
+                    application_recorded = True
+                    
+                    logger.info("Updated applicant program intent: %s for session %s", applicant_data.intended_program, session_id)
+            
+            # Get relevant context from RAG
+            context_documents = rag_svc.get_relevant_context(user_message)
+            
+            # Generate response with application confirmation if needed
+            confirmation_message = ''
+            if application_recorded:
+                # Generate a response that confirms application intent and provides program info
+                confirmation_message = CONFIRMATION_TEMPLATE.format_map({
+                    'program': applicant_data.intended_program,
+                    'name': applicant_data.name,
+                    'email': applicant_data.email,
+                    'phone': applicant_data.phone
+                })
             
-            # Get RAG response for additional program information
-            rag_response = gemini_svc.generate_rag_response(
-                query=user_message,
-                context_documents=context_documents
-            )
+            if stream:
+                # The confirmation goes out first; messages are saved when the stream ends
+                return stream_message_response(
+                    gemini_svc, user_message, context_documents, user_row,
+                    applicant_data, confirmation_message, use_cache
+                )
             
-            # Combine confirmation with program information
-            response = {
-                'text': confirmation_message + rag_response['text'],
-                'sources': rag_response.get('sources', []),
-                'confidence': rag_response.get('confidence', 1.0)
+            if application_recorded:
+                # Get RAG response for additional program information
+                rag_response = generate_cached_rag_response(
+                    gemini_svc, user_message, context_documents, use_cache
+                )
+                
+                # Combine confirmation with program information
+                response = {
+                    'text': confirmation_message + rag_response['text'],
+                    'sources': rag_response.get('sources', []),
+                    'confidence': rag_response.get('confidence', 1.0)
+                }
+            else:
+                # Regular RAG response
+                response = generate_cached_rag_response(
+                    gemini_svc, user_message, context_documents, use_cache
+                )
+            
+            # Save both messages with one Core INSERT, bypassing the ORM unit of work;
+            # the single commit below also flushes any applicant update made above
+            assistant_row = {
+                'id': str(uuid.uuid4()),
+                'session_id': session_pk,
+                'message_type': 'assistant',
+                'content': response['text'],
+                'timestamp': datetime.now(timezone.utc),
+                'source_documents': response.get('sources', []),
+                'confidence_score': response.get('confidence', 0.0)
             }
-        else:
-            # Regular RAG response
-            response = gemini_svc.generate_rag_response(
-                query=user_message,
-                context_documents=context_documents
-            )
-        
-        # Save assistant response
-        assistant_msg = ChatMessage(
-            session_id=session.id,
-            message_type='assistant',
-            content=response['text'],
-            source_documents=response.get('sources', []),
-            confidence_score=response.get('confidence', 0.0)
-        )
+            
+            # Snapshot before commit expires the instance, saving a reload
+            applicant_snapshot = applicant_data.to_dict() if applicant_data else None
+            
+            db.session.execute(insert(ChatMessage), [user_row, assistant_row])
+            db.session.commit()
         
-        db.session.add(assistant_msg)
-        db.session.commit()
+        except Exception:
+            # Keep the user's message in the history even if generation failed
+            db.session.rollback()
+            db.session.execute(insert(ChatMessage), [user_row])
+            db.session.commit()
+            raise
         
         response_data = {
-            'message_id': assistant_msg.id,
-            'response': assistant_msg.content,
-            'confidence_score': assistant_msg.confidence_score
+            'message_id': assistant_row['id'],
+            'response': assistant_row['content'],
+            'confidence_score': assistant_row['confidence_score']
         }
         
         # Add applicant data if available
-        if applicant_data:
-            response_data['applicant_data'] = applicant_data.to_dict()
+        if applicant_snapshot:
+            response_data['applicant_data'] = applicant_snapshot
         
         return jsonify(response_data)
         
     except Exception as e:
-        logging.error(f"Error processing message: {str(e)}")
+        logger.exception("Error processing message: %s", e)
         return jsonify({'error': 'Failed to process message'}), 500
 
 @chat_bp.route('/session/<session_id>/applicant-data', methods=['GET'])
 def get_applicant_data(session_id):
     """Get applicant data for a session."""
     try:
-        session = ChatSession.query.filter_by(session_id=session_id).first()
-        if not session:
+        found = get_session_with_applicant(session_id)
+        if found is None:
             return jsonify({'error': 'Session not found'}), 404
         
-        applicant_data = ApplicantData.query.filter_by(session_id=session.id).first()
+        _, applicant_data = found
         if not applicant_data:
             return jsonify({'applicant_data': None}), 200
         
         return jsonify({'applicant_data': applicant_data.to_dict()}), 200
         
     except Exception as e:
-        logging.error(f"Error getting applicant data: {str(e)}")
+        logger.exception("Error getting applicant data: %s", e)
         return jsonify({'error': 'Failed to get applicant data'}), 500 
\ No newline at end of file
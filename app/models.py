@@ -2,6 +2,11 @@ from app import db
 from datetime import datetime, timezone
 import uuid
 from enum import Enum
+from operator import attrgetter
+
+def utc_now():
+    """Current UTC time, evaluated per row for column defaults."""
+    return datetime.now(timezone.utc)
 
 class ApplicationStatus(Enum):
     """Enumeration for application status."""
@@ -18,8 +23,8 @@ class ChatSession(db.Model):
     
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     session_id = db.Column(db.String(100), unique=True, nullable=False)
-    created_at = db.Column(db.DateTime, default=datetime.now(timezone.utc))
-    updated_at = db.Column(db.DateTime, default=datetime.now(timezone.utc), onupdate=datetime.now(timezone.utc))
+    created_at = db.Column(db.DateTime, default=utc_now)
+    updated_at = db.Column(db.DateTime, default=utc_now, onupdate=utc_now)
     is_active = db.Column(db.Boolean, default=True)
     
     # Relationship to messages
@@ -34,10 +39,10 @@ class ChatMessage(db.Model):
     __tablename__ = 'chat_messages'
     
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
-    session_id = db.Column(db.String(36), db.ForeignKey('chat_sessions.id'), nullable=False)
+    session_id = db.Column(db.String(36), db.ForeignKey('chat_sessions.id'), nullable=False, index=True)
     message_type = db.Column(db.String(20), nullable=False)  # 'user' or 'assistant'
     content = db.Column(db.Text, nullable=False)
-    timestamp = db.Column(db.DateTime, default=datetime.now(timezone.utc))
+    timestamp = db.Column(db.DateTime, default=utc_now)
     
     # Additional metadata for RAG
     source_documents = db.Column(db.JSON)  # Store references to source documents used
@@ -49,7 +54,7 @@ class Application(db.Model):
     __tablename__ = 'applications'
     
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
-    session_id = db.Column(db.String(36), db.ForeignKey('chat_sessions.id'), nullable=False)
+    session_id = db.Column(db.String(36), db.ForeignKey('chat_sessions.id'), nullable=False, index=True)
     
     # Personal Information
     first_name = db.Column(db.String(100), nullable=False)
@@ -74,8 +79,8 @@ class Application(db.Model):
     
     # Application Metadata
     status = db.Column(db.Enum(ApplicationStatus), default=ApplicationStatus.PENDING)
-    submitted_at = db.Column(db.DateTime, default=datetime.now(timezone.utc))
-    updated_at = db.Column(db.DateTime, default=datetime.now(timezone.utc), onupdate=datetime.now(timezone.utc))
+    submitted_at = db.Column(db.DateTime, default=utc_now)
+    updated_at = db.Column(db.DateTime, default=utc_now, onupdate=utc_now)
     
     # Agent Processing Information
     agent_notes = db.Column(db.Text)  # Notes from the AI agent
@@ -97,6 +102,7 @@ class Document(db.Model):
     file_path = db.Column(db.String(500), nullable=False)
     file_size = db.Column(db.Integer)
     file_type = db.Column(db.String(50))
+    file_hash = db.Column(db.String(64), unique=True, index=True)  # SHA-256 of the file contents, used to skip duplicates
     
     # Document Metadata
     title = db.Column(db.String(500))
@@ -105,12 +111,13 @@ class Document(db.Model):
     
     # Processing Status
     is_processed = db.Column(db.Boolean, default=False)
+    processing_token = db.Column(db.String(36))  # identifies the processing run that owns an unprocessed document
     processed_at = db.Column(db.DateTime)
     chunk_count = db.Column(db.Integer, default=0)
     
     # Timestamps
-    uploaded_at = db.Column(db.DateTime, default=datetime.now(timezone.utc))
-    updated_at = db.Column(db.DateTime, default=datetime.now(timezone.utc), onupdate=datetime.now(timezone.utc))
+    uploaded_at = db.Column(db.DateTime, default=utc_now)
+    updated_at = db.Column(db.DateTime, default=utc_now, onupdate=utc_now)
 
 class UniversityInfo(db.Model):
     """Model for storing university-specific information and settings."""
@@ -138,34 +145,31 @@ class UniversityInfo(db.Model):
     application_deadline = db.Column(db.Date)
     
     # Timestamps
-    created_at = db.Column(db.DateTime, default=datetime.now(timezone.utc))
-    updated_at = db.Column(db.DateTime, default=datetime.now(timezone.utc), onupdate=datetime.now(timezone.utc))
+    created_at = db.Column(db.DateTime, default=utc_now)
+    updated_at = db.Column(db.DateTime, default=utc_now, onupdate=utc_now)
+
+APPLICANT_KEYS = (
+    'id', 'session_id', 'name', 'phone', 'email',
+    'intended_program', 'application_status', 'data_collection_status'
+)
+_get_applicant_fields = attrgetter(*APPLICANT_KEYS)
 
 class ApplicantData(db.Model):
     __tablename__ = 'applicant_data'
     
     id = db.Column(db.Integer, primary_key=True)
-    session_id = db.Column(db.String(36), db.ForeignKey('chat_sessions.id'), nullable=False)
+    session_id = db.Column(db.String(36), db.ForeignKey('chat_sessions.id'), nullable=False, index=True)
     name = db.Column(db.String(255), nullable=True)
     phone = db.Column(db.String(20), nullable=True)
     email = db.Column(db.String(255), nullable=True)
     intended_program = db.Column(db.String(255), nullable=True)
     application_status = db.Column(db.String(50), default='interested')
     data_collection_status = db.Column(db.String(50), default='collecting')  # collecting, complete
-    created_at = db.Column(db.DateTime, default=datetime.now(timezone.utc))
-    updated_at = db.Column(db.DateTime, default=datetime.now(timezone.utc), onupdate=datetime.now(timezone.utc))
+    created_at = db.Column(db.DateTime, default=utc_now)
+    updated_at = db.Column(db.DateTime, default=utc_now, onupdate=utc_now)
     
     # Relationship
     session = db.relationship('ChatSession', backref='applicant_data')
     
     def to_dict(self):
-        return {
-            'id': self.id,
-            'session_id': self.session_id,
-            'name': self.name,
-            'phone': self.phone,
-            'email': self.email,
-            'intended_program': self.intended_program,
-            'application_status': self.application_status,
-            'data_collection_status': self.data_collection_status
-        } 
\ No newline at end of file
+        return dict(zip(APPLICANT_KEYS, _get_applicant_fields(self))) 
\ No newline at end of file
@@ -0,0 +1,63 @@
+from datetime import datetime
+from flask import request, current_app
+from sqlalchemy import and_, or_
+from app import db
+
+def get_page_args():
+    """
+    Read keyset pagination parameters from the query string.
+    
+    Returns:
+        tuple: (limit, cursor) where cursor is a (timestamp, id) pair or None
+        
+    Raises:
+        ValueError: If `limit` or `after` is malformed
+    """
+    limit = int(request.args.get('limit', current_app.config.get('PAGE_SIZE_DEFAULT', 50)))
+    limit = max(1, min(limit, current_app.config.get('PAGE_SIZE_MAX', 200)))
+    
+    cursor = None
+    after = request.args.get('after')
+    if after:
+        timestamp, _, row_id = after.partition('|')
+        if not row_id:
+            raise ValueError("Cursor must be '<timestamp>|<id>'")
+        cursor = (datetime.fromisoformat(timestamp), row_id)
+    
+    return limit, cursor
+
+def keyset_page(statement, timestamp_column, id_column, limit, cursor=None):
+    """
+    Execute a newest-first select for one page of rows.
+    
+    Args:
+        statement: Select without ordering or limit
+        timestamp_column: Column the listing is ordered by; the select must
+            return it (or its ISO string) under the column's own key
+        id_column: Primary key column used to break timestamp ties
+        limit (int): Maximum number of rows to return
+        cursor (tuple, optional): (timestamp, id) of the last row already seen
+        
+    Returns:
+        tuple: (rows, next_cursor) where next_cursor is None on the last page
+    """
+    if cursor:
+        timestamp, row_id = cursor
+        statement = statement.where(or_(
+            timestamp_column < timestamp,
+            and_(timestamp_column == timestamp, id_column < row_id)
+        ))
+    
+    statement = statement.order_by(timestamp_column.desc(), id_column.desc()).limit(limit + 1)
+    rows = db.session.execute(statement).all()
+    
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]._mapping
+        timestamp = last[timestamp_column.key]
+        if isinstance(timestamp, datetime):
+            timestamp = timestamp.isoformat()
+        next_cursor = f"{timestamp}|{last[id_column.key]}"
+    
+    return rows, next_cursor
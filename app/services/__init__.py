@@ -1 +1,93 @@
-# Services package for business logic 
\ No newline at end of file
+# Services package for business logic 
+import logging
+import os
+import threading
+from flask import current_app
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+
+# Service caches whose warmup thread is still running
+_warming = []
+
+def _after_fork_in_child():
+    """Recover from a fork (e.g. gunicorn preload_app) taken while services were warming."""
+    global _lock
+    # The warmup thread doesn't exist in the child, so it would never release the
+    # lock or set the event; services it hadn't finished are constructed lazily instead
+    _lock = threading.Lock()
+    for services in _warming:
+        services['ready'].set()
+    _warming.clear()
+
+os.register_at_fork(after_in_child=_after_fork_in_child)
+
+def _create_service(name):
+    """Import and construct a service by name."""
+    if name == 'gemini':
+        from app.services.gemini_service import GeminiService
+        return GeminiService()
+    
+    from app.services.rag_service import RAGService
+    return RAGService()
+
+def _load_service(services, name):
+    """Return the cached service, constructing it exactly once on first use."""
+    service = services.get(name)
+    if service is None:
+        # Double-checked so concurrent first requests don't each load the models
+        with _lock:
+            service = services.get(name)
+            if service is None:
+                service = services[name] = _create_service(name)
+    return service
+
+def _warm_services(app):
+    """Construct the heavy services in the background at boot."""
+    services = app.extensions['services']
+    try:
+        with app.app_context():
+            for name in ('rag', 'gemini'):
+                try:
+                    _load_service(services, name)
+                except Exception as e:
+                    logger.exception("Failed to warm %s service: %s", name, e)
+    finally:
+        with _lock:
+            if services in _warming:
+                _warming.remove(services)
+        services['ready'].set()
+
+def init_services(app):
+    """Register the service cache on the app, prewarming it if PREWARM_SERVICES is set."""
+    services = app.extensions['services'] = {'ready': threading.Event()}
+    services['ready'].set()
+    
+    if app.config.get('PREWARM_SERVICES'):
+        start_service_warmup(app)
+
+def start_service_warmup(app):
+    """
+    Construct the heavy services on a background thread.
+    
+    Called by serving entry points rather than create_app, so CLI commands and
+    scripts that build the app don't load the models.
+    """
+    services = app.extensions['services']
+    with _lock:
+        if services in _warming:
+            return
+        _warming.append(services)
+        services['ready'].clear()
+    threading.Thread(target=_warm_services, args=(app,), daemon=True).start()
+
+def get_service(name):
+    """Get a shared service instance ('gemini' or 'rag') for the current app."""
+    services = current_app.extensions['services']
+    service = services.get(name)
+    if service is not None:
+        return service
+    
+    services['ready'].wait()
+    return _load_service(services, name)
@@ -0,0 +1,112 @@
+import functools
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+from flask import current_app, g, has_app_context
+from app.models import UniversityInfo
+
+# Process-local cache of (expires_at, value) entries
+_cache = {}
+_lock = threading.Lock()
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries also expire after a fixed number of seconds."""
+    
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the cached value, or `default` if missing or expired."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            if entry[0] <= time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return entry[1]
+    
+    def set(self, key: Hashable, value: Any):
+        """Store a value, evicting the least recently used entries beyond maxsize."""
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+    
+    def clear(self):
+        """Drop all entries."""
+        with self._lock:
+            self._data.clear()
+    
+    def __len__(self) -> int:
+        return len(self._data)
+
+def request_cached(key_fn: Optional[Callable] = None):
+    """
+    Memoize a helper's result on flask.g for the rest of the current request.
+    
+    Args:
+        key_fn (Callable, optional): Builds the cache key from the call's
+            arguments; defaults to the positional and keyword arguments
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not has_app_context():
+                return func(*args, **kwargs)
+            
+            # g lives for exactly one request, so entries need no invalidation
+            cache = g.setdefault('_request_cache', {})
+            key = (func.__qualname__, key_fn(*args, **kwargs) if key_fn else (args, tuple(sorted(kwargs.items()))))
+            if key not in cache:
+                cache[key] = func(*args, **kwargs)
+            return cache[key]
+        return wrapper
+    return decorator
+
+def _university_snapshot(university: UniversityInfo) -> Dict:
+    """Copy the columns we serve into a plain dict so it outlives the DB session."""
+    return {
+        'university_name': university.university_name,
+        'university_code': university.university_code,
+        'contact_email': university.contact_email,
+        'contact_phone': university.contact_phone,
+        'website': university.website,
+        'address': university.address,
+        'welcome_message': university.welcome_message,
+        'application_deadline': university.application_deadline
+    }
+
+@request_cached()
+def get_cached_university() -> Optional[Dict]:
+    """
+    Get the university information, hitting the database at most once per TTL.
+    
+    Returns:
+        Dict: Snapshot of the university info, or None if not configured
+    """
+    now = time.monotonic()
+    entry = _cache.get('university_info')
+    if entry and entry[0] > now:
+        return entry[1]
+    
+    with _lock:
+        entry = _cache.get('university_info')
+        if entry and entry[0] > now:
+            return entry[1]
+        
+        university = UniversityInfo.query.first()
+        snapshot = _university_snapshot(university) if university else None
+        ttl = current_app.config.get('UNIVERSITY_INFO_CACHE_TTL', 60)
+        _cache['university_info'] = (now + ttl, snapshot)
+        return snapshot
+
+def clear():
+    """Drop all cached entries (call after editing cached records)."""
+    _cache.clear()
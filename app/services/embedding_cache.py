@@ -0,0 +1,59 @@
+import hashlib
+import sqlite3
+from typing import Dict, List
+import numpy as np
+
+class EmbeddingCache:
+    """Disk-backed cache of chunk embeddings keyed by model name and SHA-256 of the text."""
+    
+    def __init__(self, path: str, model_name: str):
+        self.path = path
+        self.model_name = model_name
+        with self._connect() as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS embeddings ('
+                'model TEXT NOT NULL, text_hash TEXT NOT NULL, embedding BLOB NOT NULL, '
+                'PRIMARY KEY (model, text_hash))'
+            )
+    
+    def _connect(self) -> sqlite3.Connection:
+        # A connection per call keeps the cache safe to share across worker threads
+        return sqlite3.connect(self.path, timeout=30)
+    
+    @staticmethod
+    def hash_text(text: str) -> str:
+        """Return the cache key for a chunk of text."""
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+    
+    def get_many(self, text_hashes: List[str]) -> Dict[str, np.ndarray]:
+        """
+        Look up cached embeddings.
+        
+        Args:
+            text_hashes (List[str]): Keys from hash_text
+        
+        Returns:
+            Dict[str, np.ndarray]: float32 embeddings for the keys that were cached
+        """
+        found = {}
+        with self._connect() as conn:
+            # Stay well under SQLite's bound-parameter limit
+            for start in range(0, len(text_hashes), 500):
+                batch = text_hashes[start:start + 500]
+                rows = conn.execute(
+                    f"SELECT text_hash, embedding FROM embeddings WHERE model = ? "
+                    f"AND text_hash IN ({','.join('?' * len(batch))})",
+                    [self.model_name, *batch]
+                )
+                for text_hash, blob in rows:
+                    found[text_hash] = np.frombuffer(blob, dtype=np.float16).astype(np.float32)
+        return found
+    
+    def set_many(self, text_hashes: List[str], embeddings: np.ndarray):
+        """Store embeddings as float16, half the size of the float32 originals."""
+        rows = [
+            (self.model_name, text_hash, embedding.astype(np.float16).tobytes())
+            for text_hash, embedding in zip(text_hashes, embeddings)
+        ]
+        with self._connect() as conn:
+            conn.executemany('INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?)', rows)
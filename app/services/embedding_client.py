@@ -0,0 +1,64 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Union
+from urllib.parse import urljoin
+import numpy as np
+import requests
+
+class RemoteEmbeddingModel:
+    """
+    Client for a text-embeddings-inference style server (POST {"inputs": [...]} -> vectors).
+    
+    Stands in for a local SentenceTransformer so several app workers can share one
+    batching inference server instead of each loading the model.
+    """
+    
+    def __init__(self, url: str, max_batch_size: int = 32, max_workers: int = 4, timeout: float = 30):
+        self.url = url
+        self.max_batch_size = max_batch_size
+        self.timeout = timeout
+        self.session = requests.Session()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='embedding-client')
+    
+    def model_id(self) -> Optional[str]:
+        """Model the server reports on its /info endpoint, or None if it doesn't say."""
+        try:
+            response = self.session.get(urljoin(self.url, '/info'), timeout=self.timeout)
+            response.raise_for_status()
+            return response.json().get('model_id')
+        except (requests.RequestException, ValueError, AttributeError):
+            return None
+    
+    def _post(self, texts: List[str], normalize: bool) -> List[List[float]]:
+        response = self.session.post(
+            self.url,
+            json={'inputs': texts, 'normalize': normalize},
+            timeout=self.timeout
+        )
+        response.raise_for_status()
+        return response.json()
+    
+    def encode(self, sentences: Union[str, List[str]], batch_size: int = 32,
+               normalize_embeddings: bool = False, **kwargs) -> np.ndarray:
+        """
+        Embed texts on the server, posting batches concurrently.
+        
+        Args:
+            sentences (str or List[str]): Text(s) to embed
+            batch_size (int): Requested batch size, capped at max_batch_size
+            normalize_embeddings (bool): Ask the server for unit-length vectors
+        
+        Returns:
+            np.ndarray: float32 embeddings, one row per text (1-D for a single string)
+        """
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        size = min(batch_size, self.max_batch_size)
+        batches = [texts[start:start + size] for start in range(0, len(texts), size)]
+        
+        if len(batches) <= 1:
+            results = [self._post(batch, normalize_embeddings) for batch in batches]
+        else:
+            results = self._executor.map(self._post, batches, [normalize_embeddings] * len(batches))
+        
+        embeddings = np.asarray([vector for result in results for vector in result], dtype=np.float32)
+        return embeddings[0] if single else embeddings
@@ -1,8 +1,34 @@
 import google.generativeai as genai
 from flask import current_app
 import logging
+import orjson
 from typing import Dict, List, Optional
 
+logger = logging.getLogger(__name__)
+
+# Fixed parts of the RAG prompt, built once
+RAG_SYSTEM_PROMPT = (
+    "You are a helpful university assistant chatbot. Use the provided context documents to answer questions about the university.\n"
+    "Always be accurate and helpful. If you cannot find the answer in the provided context, say so clearly.\n"
+    "Maintain a friendly and professional tone.\n"
+)
+RAG_HISTORY_HEADER = "\nPrevious conversation:\n"
+RAG_CONTEXT_HEADER = "\nRelevant University Information:\n"
+
+# Application intent prompt, split around the quoted user message
+INTENT_PROMPT_PREFIX = (
+    "Analyze the following message to determine if the user is expressing intent to apply to a university.\n\n"
+    'Message: "'
+)
+INTENT_PROMPT_SUFFIX = (
+    '"\n\n'
+    "Respond with a JSON object containing:\n"
+    '- "has_application_intent": boolean\n'
+    '- "confidence": float between 0 and 1\n'
+    '- "reasoning": string explaining the decision\n\n'
+    "Only respond with the JSON object, no other text.\n"
+)
+
 class GeminiService:
     """Service class for handling Google Gemini API interactions."""
     
@@ -21,10 +47,10 @@ class GeminiService:
             genai.configure(api_key=api_key)
             # Initialize the model
             self.model = genai.GenerativeModel('gemini-1.5-flash')
-            logging.info("Gemini API configured successfully")
+            logger.info("Gemini API configured successfully")
             
         except Exception as e:
-            logging.error(f"Failed to configure Gemini API: {str(e)}")
+            logger.exception("Failed to configure Gemini API: %s", e)
             raise
     
     def generate_response(self, prompt: str, context: Optional[str] = None) -> Dict:
@@ -58,7 +84,7 @@ class GeminiService:
             return result
             
         except Exception as e:
-            logging.error(f"Error generating Gemini response: {str(e)}")
+            logger.exception("Error generating Gemini response: %s", e)
             return {
                 'text': "I apologize, but I'm experiencing technical difficulties. Please try again later.",
                 'error': str(e)
@@ -93,12 +119,41 @@ class GeminiService:
             }
             
         except Exception as e:
-            logging.error(f"Error generating RAG response: {str(e)}")
+            logger.exception("Error generating RAG response: %s", e)
             return {
                 'text': "I apologize, but I couldn't retrieve the information you requested. Please try rephrasing your question.",
                 'error': str(e)
             }
     
+    def stream_rag_response(self, query: str, context_documents: List[str],
+                            conversation_history: Optional[List[Dict]] = None) -> Dict:
+        """
+        Start a streamed RAG response with context documents.
+        
+        Args:
+            query (str): User's query
+            context_documents (List[str]): Relevant document chunks
+            conversation_history (List[Dict], optional): Previous conversation
+            
+        Returns:
+            Dict: 'chunks' iterator of response text pieces and sources; 'confidence'
+                is filled in once the chunks are exhausted. Errors propagate to the caller.
+        """
+        rag_prompt = self._construct_rag_prompt(
+            query, context_documents, conversation_history
+        )
+        
+        response = self.model.generate_content(rag_prompt, stream=True)
+        result = {'sources': context_documents, 'confidence': None}
+        
+        def chunks():
+            for chunk in response:
+                yield chunk.text
+            result['confidence'] = self._calculate_confidence(response)
+        
+        result['chunks'] = chunks()
+        return result
+    
     def analyze_application_intent(self, message: str) -> Dict:
         """
         Analyze if the user message indicates intent to apply for university.
@@ -110,32 +165,20 @@ class GeminiService:
             Dict: Analysis result with intent and confidence
         """
         try:
-            analysis_prompt = f"""
-            Analyze the following message to determine if the user is expressing intent to apply to a university.
-            
-            Message: "{message}"
-            
-            Respond with a JSON object containing:
-            - "has_application_intent": boolean
-            - "confidence": float between 0 and 1
-            - "reasoning": string explaining the decision
-            
-            Only respond with the JSON object, no other text.
-            """
+            analysis_prompt = INTENT_PROMPT_PREFIX + message.replace('"', '\\"') + INTENT_PROMPT_SUFFIX
             
             response = self.model.generate_content(analysis_prompt)
             
             # Parse the JSON response
-            import json
             try:
-                result = json.loads(response.text)
+                result = orjson.loads(response.text)
                 return result
-            except json.JSONDecodeError:
+            except orjson.JSONDecodeError:
                 # Fallback to keyword-based analysis
                 return self._keyword_based_intent_analysis(message)
             
         except Exception as e:
-            logging.error(f"Error analyzing application intent: {str(e)}")
+            logger.exception("Error analyzing application intent: %s", e)
             return self._keyword_based_intent_analysis(message)
     
     def _construct_prompt(self, prompt: str, context: Optional[str] = None) -> str:
@@ -153,39 +196,26 @@ class GeminiService:
     def _construct_rag_prompt(self, query: str, context_documents: List[str], 
                             conversation_history: Optional[List[Dict]] = None) -> str:
         """Construct a RAG prompt with documents and conversation history."""
+        parts = [RAG_SYSTEM_PROMPT]
         
-        system_prompt = """
-        You are a helpful university assistant chatbot. Use the provided context documents to answer questions about the university.
-        Always be accurate and helpful. If you cannot find the answer in the provided context, say so clearly.
-        Maintain a friendly and professional tone.
-        """
+        # Add context documents right after the fixed instructions: they are shared across
+        # sessions (and come back in a stable order), so the prompt prefix can be cached
+        parts.append(RAG_CONTEXT_HEADER)
+        parts.extend(
+            f"\n[Document {i}]:\n{doc}\n"
+            for i, doc in enumerate(context_documents, 1)
+        )
         
-        # Add conversation history if available
-        history_text = ""
+        # Add conversation history if available (last 5 messages for context)
         if conversation_history:
-            history_text = "\n\nPrevious conversation:\n"
-            for msg in conversation_history[-5:]:  # Last 5 messages for context
-                role = msg.get('message_type', 'user')
-                content = msg.get('content', '')
-                history_text += f"{role.capitalize()}: {content}\n"
-        
-        # Add context documents
-        context_text = "\n\nRelevant University Information:\n"
-        for i, doc in enumerate(context_documents, 1):
-            context_text += f"\n[Document {i}]:\n{doc}\n"
-        
-        # Construct final prompt
-        final_prompt = f"""
-        {system_prompt}
-        {history_text}
-        {context_text}
-        
-        Current Question: {query}
-        
-        Response:
-        """
+            parts.append(RAG_HISTORY_HEADER)
+            parts.extend(
+                f"{msg.get('message_type', 'user').capitalize()}: {msg.get('content', '')}\n"
+                for msg in conversation_history[-5:]
+            )
         
-        return final_prompt
+        parts.append(f"\nCurrent Question: {query}\n\nResponse:\n")
+        return ''.join(parts)
     
     def _calculate_confidence(self, response) -> float:
         """Calculate confidence score for the response."""
@@ -0,0 +1,121 @@
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Iterator, Optional
+import pypdfium2 as pdfium
+
+logger = logging.getLogger(__name__)
+
+# PDFium is not thread-safe, so calls from concurrent document workers are serialized
+_pdfium_lock = threading.Lock()
+
+def count_pdf_pages(file_path: str) -> int:
+    """Return the number of pages in a PDF."""
+    with _pdfium_lock:
+        pdf = pdfium.PdfDocument(file_path)
+        try:
+            return len(pdf)
+        finally:
+            pdf.close()
+
+def iter_page_text(file_path: str, start: int, end: int) -> Iterator[str]:
+    """Yield the text of each non-empty page in [start, end) of a PDF, with a trailing newline."""
+    # PDFium reads the file natively by path, with no Python file object in between
+    with _pdfium_lock:
+        pdf = pdfium.PdfDocument(file_path)
+        end = min(end, len(pdf))
+    try:
+        for index in range(start, end):
+            with _pdfium_lock:
+                page = pdf[index]
+                textpage = page.get_textpage()
+                page_text = textpage.get_text_bounded()
+                textpage.close()
+                page.close()
+            if page_text:
+                yield page_text.replace("\r\n", "\n") + "\n"
+    finally:
+        with _pdfium_lock:
+            pdf.close()
+
+def extract_page_range(file_path: str, start: int, end: int) -> str:
+    """Extract the text of pages [start, end) of a PDF (run in worker processes)."""
+    return ''.join(iter_page_text(file_path, start, end))
+
+class PageExtractionPool:
+    """
+    Long-lived pool of worker processes that extract page blocks of large PDFs.
+    
+    Workers are spawned rather than forked, so they never inherit the serving
+    process's threads, locks or loaded models; this module keeps their imports light.
+    The pool starts on first use and falls back to inline extraction where processes
+    aren't available (AWS Lambda has no /dev/shm for the pool's queues).
+    """
+    
+    def __init__(self, workers: int, pages_per_task: int):
+        self.workers = workers
+        self.pages_per_task = pages_per_task
+        self._executor = None
+        self._unavailable = False
+        self._lock = threading.Lock()
+    
+    def _get_executor(self) -> Optional[ProcessPoolExecutor]:
+        with self._lock:
+            if self._executor is None and not self._unavailable:
+                try:
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=multiprocessing.get_context('spawn')
+                    )
+                except (OSError, NotImplementedError) as e:
+                    logger.warning("Process pool unavailable, extracting PDFs inline: %s", e)
+                    self._unavailable = True
+            return self._executor
+    
+    def _discard_executor(self, executor: ProcessPoolExecutor):
+        """Drop a broken pool so the next document starts a fresh one."""
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+    
+    def iter_text(self, file_path: str, page_count: int) -> Iterator[str]:
+        """
+        Yield the text of a PDF's pages in reading order, a block of pages at a time.
+        
+        Args:
+            file_path (str): Path to the PDF file
+            page_count (int): Number of pages in the file
+        
+        Yields:
+            str: Text of successive page blocks
+        """
+        executor = self._get_executor()
+        if executor is None:
+            yield from iter_page_text(file_path, 0, page_count)
+            return
+        
+        starts = list(range(0, page_count, self.pages_per_task))
+        try:
+            futures = [
+                executor.submit(extract_page_range, file_path, start, start + self.pages_per_task)
+                for start in starts
+            ]
+        except (OSError, RuntimeError, BrokenProcessPool) as e:
+            logger.warning("Process pool failed, extracting %s inline: %s", file_path, e)
+            self._discard_executor(executor)
+            yield from iter_page_text(file_path, 0, page_count)
+            return
+        
+        for index, future in enumerate(futures):
+            try:
+                block = future.result()
+            except BrokenProcessPool as e:
+                # A worker died (e.g. killed for memory); finish this document inline
+                logger.warning("Process pool broke, extracting rest of %s inline: %s", file_path, e)
+                self._discard_executor(executor)
+                yield from iter_page_text(file_path, starts[index], page_count)
+                return
+            yield block
@@ -1,14 +1,127 @@
 import os
+import bisect
 import logging
-from typing import List, Dict, Optional
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+import numpy as np
+import torch
 from sentence_transformers import SentenceTransformer
 import chromadb
 from chromadb.config import Settings
-import PyPDF2
 from flask import current_app
+from sqlalchemy import bindparam, update
 from app.models import Document
+from app.services.cache import TTLCache
+from app.services.embedding_client import RemoteEmbeddingModel
+from app.services.embedding_cache import EmbeddingCache
+from app.services.pdf_text import PageExtractionPool, count_pdf_pages, iter_page_text
 from app import db
 
+logger = logging.getLogger(__name__)
+
+EMBEDDING_MODEL_NAME = 'all-MiniLM-L6-v2'
+
+SENTENCE_END_RE = re.compile(r'[.!?]')
+
+# Embedding models shared by every RAGService in the process, keyed by device and backend
+_embedding_models = {}
+_embedding_models_lock = threading.Lock()
+
+def load_embedding_model(device: str, backend: str = 'torch', onnx_file: Optional[str] = None) -> SentenceTransformer:
+    """Load the embedding model at most once per process, device and backend."""
+    key = (device, backend, onnx_file)
+    with _embedding_models_lock:
+        model = _embedding_models.get(key)
+        if model is None:
+            model = _embedding_models[key] = SentenceTransformer(
+                EMBEDDING_MODEL_NAME,
+                device=device,
+                backend=backend,
+                model_kwargs={'file_name': onnx_file} if backend == 'onnx' and onnx_file else None
+            )
+        return model
+
+# One Chroma client per database path; separate clients over the same files
+# keep separate index caches and can clobber each other's collections
+_chroma_clients = {}
+_chroma_clients_lock = threading.Lock()
+
+def _reset_locks_after_fork():
+    """Replace locks a forked child may have inherited held by a thread that no longer exists."""
+    global _embedding_models_lock, _chroma_clients_lock
+    _embedding_models_lock = threading.Lock()
+    _chroma_clients_lock = threading.Lock()
+
+os.register_at_fork(after_in_child=_reset_locks_after_fork)
+
+def get_chroma_client(path: str) -> chromadb.ClientAPI:
+    """Return the process-wide persistent Chroma client for a database path."""
+    key = os.path.abspath(path)
+    with _chroma_clients_lock:
+        client = _chroma_clients.get(key)
+        if client is None:
+            client = _chroma_clients[key] = chromadb.PersistentClient(
+                path=key,
+                settings=Settings(anonymized_telemetry=False)
+            )
+        return client
+
+class SemanticSearchCache:
+    """Thread-safe LRU of search results that also matches near-duplicate queries by embedding."""
+    
+    def __init__(self, maxsize: int, ttl: float, threshold: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.threshold = threshold
+        self._data = OrderedDict()  # (scope, query) -> (expires_at, embedding, results)
+        self._matrix = None  # stacked embeddings of self._keys, rebuilt after changes
+        self._keys = []
+        self._lock = threading.Lock()
+    
+    def get(self, embedding: np.ndarray, scope: str) -> Any:
+        """Return the results of the most similar cached query in the same scope, or None."""
+        with self._lock:
+            if self._matrix is None:
+                self._keys = list(self._data)
+                self._matrix = np.stack([self._data[key][1] for key in self._keys]) if self._keys else None
+            if self._matrix is None:
+                return None
+            
+            # Embeddings are unit-normalized, so the dot product is the cosine similarity;
+            # a brute-force scan over at most `maxsize` rows is a single small matmul
+            scores = self._matrix @ embedding
+            for i in np.argsort(scores)[::-1]:
+                if scores[i] < self.threshold:
+                    return None
+                key = self._keys[i]
+                if key[0] != scope:
+                    continue
+                entry = self._data.get(key)
+                if entry is None or entry[0] <= time.monotonic():
+                    continue
+                self._data.move_to_end(key)
+                return entry[2]
+            return None
+    
+    def set(self, embedding: np.ndarray, scope: str, query: str, results: Any):
+        """Store results for a query, evicting the least recently used entries beyond maxsize."""
+        with self._lock:
+            key = (scope, query)
+            self._data[key] = (time.monotonic() + self.ttl, embedding, results)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+            self._matrix = None
+    
+    def clear(self):
+        """Drop all entries."""
+        with self._lock:
+            self._data.clear()
+            self._matrix = None
+
 class RAGService:
     """Service class for Retrieval-Augmented Generation functionality."""
     
@@ -17,36 +130,109 @@ class RAGService:
         self.embedding_model = None
         self.chroma_client = None
         self.collection = None
+        
+        # Exact-query and near-duplicate-query caches of search results
+        self._search_cache = TTLCache(
+            maxsize=current_app.config.get('SEARCH_CACHE_SIZE', 1024),
+            ttl=current_app.config.get('SEARCH_CACHE_TTL', 300)
+        )
+        self._semantic_cache = SemanticSearchCache(
+            maxsize=current_app.config.get('SEARCH_CACHE_SIZE', 1024),
+            ttl=current_app.config.get('SEARCH_CACHE_TTL', 300),
+            threshold=current_app.config.get('SEMANTIC_CACHE_THRESHOLD', 0.95)
+        )
         self._initialize_components()
     
     def _initialize_components(self):
         """Initialize embedding model and vector database."""
         try:
-            # Initialize sentence transformer for embeddings
-            self.embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
-            logging.info("Embedding model initialized successfully")
+            # Initialize sentence transformer for embeddings, or a client for the shared server
+            embedding_service_url = current_app.config.get('EMBEDDING_SERVICE_URL')
+            backend = current_app.config.get('EMBEDDING_BACKEND', 'torch')
+            onnx_file = current_app.config.get('EMBEDDING_ONNX_FILE')
+            if embedding_service_url:
+                self.embedding_model = RemoteEmbeddingModel(
+                    embedding_service_url,
+                    max_batch_size=current_app.config.get('EMBEDDING_SERVICE_BATCH_SIZE', 32),
+                    timeout=current_app.config.get('EMBEDDING_SERVICE_TIMEOUT', 30)
+                )
+            else:
+                device = current_app.config.get('EMBEDDING_DEVICE') or ('cuda' if torch.cuda.is_available() else 'cpu')
+                self.embedding_model = load_embedding_model(device, backend, onnx_file)
+            self.embedding_batch_size = current_app.config.get('EMBEDDING_BATCH_SIZE', 64)
+            
+            # Settings used on every document/query, read once instead of through current_app
+            self.chunk_size = current_app.config.get('CHUNK_SIZE', 1000)
+            self.chunk_overlap = current_app.config.get('CHUNK_OVERLAP', 200)
+            self.min_chunk_chars = current_app.config.get('MIN_CHUNK_CHARS', 40)
+            self.top_k = current_app.config.get('TOP_K_RESULTS', 5)
+            self.add_batch_size = current_app.config.get('CHROMA_ADD_BATCH_SIZE', 200)
+            self.pdf_extract_workers = current_app.config.get('PDF_EXTRACT_WORKERS', 1)
+            self.pdf_pages_per_task = current_app.config.get('PDF_PAGES_PER_TASK', 5)
+            self.pdf_parallel_min_pages = current_app.config.get('PDF_PARALLEL_MIN_PAGES', 200)
+            self._page_pool = PageExtractionPool(self.pdf_extract_workers, self.pdf_pages_per_task)
+            logger.info("Embedding model initialized successfully")
             
             # Initialize ChromaDB
             vector_db_path = current_app.config.get('VECTOR_DB_PATH', './vector_db')
-            self.chroma_client = chromadb.PersistentClient(
-                path=vector_db_path,
-                settings=Settings(anonymized_telemetry=False)
+            self.chroma_client = get_chroma_client(vector_db_path)
+            
+            # Embeddings of previously seen chunks, so re-ingested text isn't re-encoded;
+            # quantized backends produce slightly different vectors, and a remote server
+            # may run another model entirely, so each gets its own entries
+            if embedding_service_url:
+                model_id = self.embedding_model.model_id() or 'unknown'
+                cache_model_name = f"remote:{embedding_service_url}:{model_id}"
+            elif backend != 'torch':
+                cache_model_name = f"{EMBEDDING_MODEL_NAME}:{onnx_file or backend}"
+            else:
+                cache_model_name = EMBEDDING_MODEL_NAME
+            self.embedding_cache = EmbeddingCache(
+                os.path.join(vector_db_path, 'embedding_cache.sqlite3'),
+                cache_model_name
             )
             
-            # Get or create collection
-            self.collection = self.chroma_client.get_or_create_collection(
-                name="university_documents",
-                metadata={"description": "University documents for RAG"}
-            )
+            # Get or create collection. New collections use inner product, which equals
+            # cosine similarity for the normalized embeddings; an existing collection
+            # keeps the space its index was built with (passing new metadata to
+            # get_or_create would relabel it without rebuilding the index).
+            try:
+                self.collection = self.chroma_client.get_collection(name="university_documents")
+            except ValueError:
+                self.collection = self.chroma_client.create_collection(
+                    name="university_documents",
+                    metadata={"description": "University documents for RAG", "hnsw:space": "ip"}
+                )
+            self.distance_space = (self.collection.metadata or {}).get('hnsw:space', 'l2')
+            
+            if current_app.config.get('WARM_VECTOR_INDEX', True):
+                self._warm_vector_index()
             
-            logging.info("Vector database initialized successfully")
+            logger.info("Vector database initialized successfully")
             
         except Exception as e:
-            logging.error(f"Failed to initialize RAG components: {str(e)}")
+            logger.exception("Failed to initialize RAG components: %s", e)
             raise
     
+    def _warm_vector_index(self):
+        """Load the HNSW index (and the embedding model) with a throwaway query."""
+        try:
+            if self.collection.count() == 0:
+                return
+            query_embedding = self.embedding_model.encode(
+                ['warmup'],
+                normalize_embeddings=True,
+                convert_to_numpy=True,
+                show_progress_bar=False
+            )
+            self.collection.query(query_embeddings=query_embedding, n_results=1, include=[])
+        except Exception as e:
+            # Only a latency optimization; the first real search loads the index instead
+            logger.warning("Vector index warmup failed: %s", e)
+    
     def process_pdf_document(self, file_path: str, document_id: str, 
-                           metadata: Optional[Dict] = None) -> bool:
+                           metadata: Optional[Dict] = None,
+                           processing_token: Optional[str] = None) -> bool:
         """
         Process a PDF document and store its chunks in the vector database.
         
@@ -54,26 +240,60 @@ class RAGService:
             file_path (str): Path to the PDF file
             document_id (str): Unique identifier for the document
             metadata (Dict, optional): Additional metadata for the document
+            processing_token (str, optional): Only mark the document processed if
+                it is still owned by this processing run
             
         Returns:
             bool: True if processing was successful
         """
-        try:
+        processing_tokens = {document_id: processing_token} if processing_token else None
+        return self.process_pdf_documents(
+            [(file_path, document_id, metadata)],
+            processing_tokens
+        )[document_id]
+    
+    def process_pdf_documents(self, documents: List[Tuple[str, str, Optional[Dict]]],
+                              processing_tokens: Optional[Dict[str, str]] = None) -> Dict[str, bool]:
+        """
+        Process several PDF documents, embedding all of their chunks together and
+        writing them to the vector database in fixed-size batches.
+        
+        Args:
+            documents (List[Tuple]): (file_path, document_id, metadata) for each document
+            processing_tokens (Dict[str, str], optional): Processing run that must still
+                own each document for it to be marked processed, by document ID
+            
+        Returns:
+            Dict[str, bool]: Whether processing succeeded, by document ID
+        """
+        outcome = {document_id: False for _, document_id, _ in documents}
+        chunk_counts = {}
+        
+        # Create chunks with metadata
+        chunk_ids = []
+        chunk_texts = []
+        chunk_metadatas = []
+        
+        for file_path, document_id, metadata in documents:
             # Extract text from PDF
             text_chunks = self._extract_text_from_pdf(file_path)
             
             if not text_chunks:
-                logging.warning(f"No text extracted from PDF: {file_path}")
-                return False
+                logger.warning("No text extracted from PDF: %s", file_path)
+                continue
+            
+            # Drop fragments too short to be worth embedding and repeated chunks
+            text_chunks = [
+                chunk for chunk in dict.fromkeys(text_chunks)
+                if len(chunk) >= self.min_chunk_chars
+            ]
             
-            # Create chunks with metadata
-            chunk_ids = []
-            chunk_texts = []
-            chunk_metadatas = []
+            if not text_chunks:
+                logger.warning("No chunks of at least %s characters in PDF: %s", self.min_chunk_chars, file_path)
+                continue
             
             for i, chunk in enumerate(text_chunks):
-                chunk_id = f"{document_id}_chunk_{i}"
-                chunk_ids.append(chunk_id)
+                chunk_ids.append(f"{document_id}_chunk_{i}")
                 chunk_texts.append(chunk)
                 
                 chunk_metadata = {
@@ -87,30 +307,101 @@ class RAGService:
                 
                 chunk_metadatas.append(chunk_metadata)
             
-            # Generate embeddings
-            embeddings = self.embedding_model.encode(chunk_texts).tolist()
-            
-            # Store in vector database
-            self.collection.add(
-                ids=chunk_ids,
-                embeddings=embeddings,
-                documents=chunk_texts,
-                metadatas=chunk_metadatas
+            chunk_counts[document_id] = len(text_chunks)
+        
+        if not chunk_counts:
+            return outcome
+        
+        try:
+            # Generate embeddings for every chunk in one pass
+            embeddings = self._encode_chunks(chunk_texts)
+            
+            # Store in vector database, in batches Chroma handles efficiently
+            for start in range(0, len(chunk_ids), self.add_batch_size):
+                end = start + self.add_batch_size
+                self.collection.add(
+                    ids=chunk_ids[start:end],
+                    embeddings=embeddings[start:end],
+                    documents=chunk_texts[start:end],
+                    metadatas=chunk_metadatas[start:end]
+                )
+            
+            self._clear_search_caches()
+            
+            documents_table = Document.__table__
+            mark_processed = (
+                update(documents_table)
+                .where(documents_table.c.id == bindparam('document_id'))
+                .values(is_processed=True, chunk_count=bindparam('chunk_count'), processing_token=None)
             )
             
-            # Update document record
-            document = Document.query.get(document_id)
-            if document:
-                document.is_processed = True
-                document.chunk_count = len(text_chunks)
-                db.session.commit()
+            if processing_tokens is None:
+                # Update document records with one executemany UPDATE
+                db.session.execute(mark_processed, [
+                    {'document_id': document_id, 'chunk_count': chunk_count}
+                    for document_id, chunk_count in chunk_counts.items()
+                ])
+                owned = set(chunk_counts)
+            else:
+                # One statement per document, so each row count tells whether the run still owns it
+                mark_processed = mark_processed.where(
+                    documents_table.c.processing_token == bindparam('owner_token')
+                )
+                owned = {
+                    document_id
+                    for document_id, chunk_count in chunk_counts.items()
+                    if db.session.execute(mark_processed, {
+                        'document_id': document_id,
+                        'chunk_count': chunk_count,
+                        'owner_token': processing_tokens.get(document_id)
+                    }).rowcount
+                }
+            db.session.commit()
             
-            logging.info(f"Successfully processed document {document_id} with {len(text_chunks)} chunks")
-            return True
+            for document_id, chunk_count in chunk_counts.items():
+                if document_id not in owned:
+                    logger.warning("Document %s was taken over by another processing run", document_id)
+                    continue
+                outcome[document_id] = True
+                logger.info("Successfully processed document %s with %s chunks", document_id, chunk_count)
             
         except Exception as e:
-            logging.error(f"Error processing PDF document {document_id}: {str(e)}")
-            return False
+            logger.exception("Error processing PDF documents %s: %s", list(chunk_counts), e)
+        
+        return outcome
+    
+    def _encode_chunks(self, chunk_texts: List[str]) -> np.ndarray:
+        """
+        Embed document chunks, encoding only those missing from the embedding cache.
+        
+        Args:
+            chunk_texts (List[str]): Chunk texts to embed
+            
+        Returns:
+            np.ndarray: One normalized embedding per chunk, in input order
+        """
+        text_hashes = [EmbeddingCache.hash_text(text) for text in chunk_texts]
+        cached = self.embedding_cache.get_many(text_hashes)
+        
+        # Text repeated across documents (shared boilerplate pages) is encoded once
+        missing = {
+            text_hash: text
+            for text_hash, text in zip(text_hashes, chunk_texts)
+            if text_hash not in cached
+        }
+        
+        if missing:
+            encoded = self.embedding_model.encode(
+                list(missing.values()),
+                batch_size=self.embedding_batch_size,
+                normalize_embeddings=True,
+                convert_to_numpy=True,
+                show_progress_bar=False
+            )
+            self.embedding_cache.set_many(list(missing), encoded)
+            cached.update(zip(missing, encoded))
+        
+        return np.stack([cached[text_hash] for text_hash in text_hashes]).astype(np.float32, copy=False)
     
     def search_similar_documents(self, query: str, n_results: int = 5, 
                                filter_metadata: Optional[Dict] = None) -> List[Dict]:
@@ -129,8 +420,25 @@ class RAGService:
             if not self.collection:
                 self._initialize_components()
             
+            # Repeated queries skip both the embedding model and the vector search
+            scope = repr((n_results, filter_metadata))
+            cached = self._search_cache.get((scope, query))
+            if cached is not None:
+                return cached
+            
             # Generate embedding for the query
-            query_embedding = self.embedding_model.encode([query]).tolist()
+            query_embedding = self.embedding_model.encode(
+                [query],
+                normalize_embeddings=True,
+                convert_to_numpy=True,
+                show_progress_bar=False
+            )
+            
+            # Near-duplicate queries reuse an earlier search
+            cached = self._semantic_cache.get(query_embedding[0], scope)
+            if cached is not None:
+                self._search_cache.set((scope, query), cached)
+                return cached
             
             # Search in vector database
             results = self.collection.query(
@@ -143,19 +451,30 @@ class RAGService:
             # Format results
             formatted_results = []
             if results['documents'] and results['documents'][0]:
-                for i in range(len(results['documents'][0])):
-                    formatted_results.append({
-                        'text': results['documents'][0][i],
-                        'metadata': results['metadatas'][0][i],
-                        'similarity_score': 1 - results['distances'][0][i]  # Convert distance to similarity
-                    })
+                similarities = self._distances_to_similarities(results['distances'][0])
+                formatted_results = [
+                    {'text': text, 'metadata': metadata, 'similarity_score': similarity}
+                    for text, metadata, similarity in zip(
+                        results['documents'][0], results['metadatas'][0], similarities
+                    )
+                ]
             
+            self._search_cache.set((scope, query), formatted_results)
+            self._semantic_cache.set(query_embedding[0], scope, query, formatted_results)
             return formatted_results
             
         except Exception as e:
-            logging.error(f"Error searching similar documents: {str(e)}")
+            logger.exception("Error searching similar documents: %s", e)
             return []
     
+    def _distances_to_similarities(self, distances: List[float]) -> List[float]:
+        """Convert Chroma distances between normalized embeddings to cosine similarities."""
+        distances = np.asarray(distances, dtype=np.float64)
+        if self.distance_space == 'l2':
+            # Chroma reports squared L2, which is 2 - 2cos for unit vectors
+            return (1.0 - distances / 2).tolist()
+        return (1.0 - distances).tolist()
+    
     def get_relevant_context(self, query: str, category_filter: Optional[str] = None) -> List[str]:
         """
         Get relevant context documents for a query.
@@ -176,17 +495,27 @@ class RAGService:
             # Search for similar documents
             results = self.search_similar_documents(
                 query=query,
-                n_results=current_app.config.get('TOP_K_RESULTS', 5),
+                n_results=self.top_k,
                 filter_metadata=metadata_filter if metadata_filter else None
             )
             
+            # Order by position in the corpus rather than by score, so queries that retrieve
+            # overlapping chunks produce the same prompt prefix for the LLM's prefix cache
+            results = sorted(
+                results,
+                key=lambda result: (
+                    result['metadata'].get('document_id', ''),
+                    result['metadata'].get('chunk_index', 0)
+                )
+            )
+            
             # Extract text content only
             context_texts = [result['text'] for result in results]
             
             return context_texts
             
         except Exception as e:
-            logging.error(f"Error getting relevant context: {str(e)}")
+            logger.exception("Error getting relevant context: %s", e)
             return []
     
     def _extract_text_from_pdf(self, file_path: str) -> List[str]:
@@ -200,33 +529,93 @@ class RAGService:
             List[str]: List of text chunks
         """
         try:
-            text_chunks = []
-            
-            with open(file_path, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                
-                # Extract text from all pages
-                full_text = ""
-                for page in pdf_reader.pages:
-                    page_text = page.extract_text()
-                    if page_text:
-                        full_text += page_text + "\n"
-                
-                # Chunk the text
-                if full_text.strip():
-                    chunks = self._chunk_text(
-                        full_text,
-                        chunk_size=current_app.config.get('CHUNK_SIZE', 1000),
-                        chunk_overlap=current_app.config.get('CHUNK_OVERLAP', 200)
-                    )
-                    text_chunks.extend(chunks)
+            page_count = count_pdf_pages(file_path)
             
-            return text_chunks
+            # Chunk pages as they are extracted rather than joining the whole document first
+            return list(self._iter_chunks(
+                self._iter_page_text(file_path, page_count),
+                chunk_size=self.chunk_size,
+                chunk_overlap=self.chunk_overlap
+            ))
             
         except Exception as e:
-            logging.error(f"Error extracting text from PDF {file_path}: {str(e)}")
+            logger.exception("Error extracting text from PDF %s: %s", file_path, e)
             return []
     
+    def _iter_page_text(self, file_path: str, page_count: int) -> Iterator[str]:
+        """
+        Yield page text in reading order, fanning page blocks out to worker processes.
+        
+        Args:
+            file_path (str): Path to the PDF file
+            page_count (int): Number of pages in the file
+            
+        Yields:
+            str: Text of successive pages (or blocks of pages)
+        """
+        # PDFium extracts small documents faster than the pool can hand out the work
+        if self.pdf_extract_workers > 1 and page_count >= self.pdf_parallel_min_pages:
+            yield from self._page_pool.iter_text(file_path, page_count)
+        else:
+            yield from iter_page_text(file_path, 0, page_count)
+    
+    def _iter_chunks(self, blocks: Iterable[str], chunk_size: int = 1000,
+                     chunk_overlap: int = 200) -> Iterator[str]:
+        """
+        Split streamed text into overlapping chunks, holding only about one chunk in memory.
+        
+        Args:
+            blocks (Iterable[str]): Successive pieces of the text
+            chunk_size (int): Maximum size of each chunk
+            chunk_overlap (int): Overlap between chunks
+            
+        Yields:
+            str: Text chunks, identical to chunking the concatenated text
+        """
+        blocks = iter(blocks)
+        buffer = ''
+        base = 0  # position of buffer[0] in the whole text
+        start = 0  # position where the current chunk starts
+        sentence_ends = []  # positions just past each buffered sentence ending
+        exhausted = False
+        
+        while True:
+            # Buffer past one full window, so we know whether this is the last chunk.
+            # Consumed text is only dropped here, when a block is appended anyway;
+            # re-slicing the buffer after every chunk would copy the rest of it each time.
+            while not exhausted and base + len(buffer) - start <= chunk_size:
+                block = next(blocks, None)
+                if block is None:
+                    exhausted = True
+                    break
+                del sentence_ends[:bisect.bisect_right(sentence_ends, start)]
+                offset = base + len(buffer)
+                sentence_ends.extend(offset + match.end() for match in SENTENCE_END_RE.finditer(block))
+                buffer = buffer[start - base:] + block
+                base = start
+            
+            # Last chunk
+            if base + len(buffer) - start <= chunk_size:
+                chunk = buffer[start - base:].strip()
+                if chunk:
+                    yield chunk
+                return
+            
+            # Break at the last sentence ending in the window; one inside the
+            # overlap would stop the window from advancing
+            end = start + chunk_size
+            idx = bisect.bisect_right(sentence_ends, end) - 1
+            if idx >= 0 and sentence_ends[idx] > start + chunk_overlap:
+                end = sentence_ends[idx]
+            
+            # The only string built per chunk is the emitted one
+            chunk = buffer[start - base:end - base].strip()
+            if chunk:
+                yield chunk
+            
+            # Move start position (with overlap)
+            start = end - chunk_overlap
+    
     def _chunk_text(self, text: str, chunk_size: int = 1000, chunk_overlap: int = 200) -> List[str]:
         """
         Split text into overlapping chunks.
@@ -240,38 +629,10 @@ class RAGService:
             List[str]: List of text chunks
         """
         try:
-            chunks = []
-            start = 0
-            text_length = len(text)
-            
-            while start < text_length:
-                # Calculate end position
-                end = start + chunk_size
-                
-                # If this is not the last chunk, try to break at a sentence boundary
-                if end < text_length:
-                    # Look for sentence endings within the overlap area
-                    look_back_start = max(start, end - chunk_overlap)
-                    chunk_text = text[start:end]
-                    
-                    # Find the last sentence ending
-                    for i in range(len(chunk_text) - 1, -1, -1):
-                        if chunk_text[i] in '.!?':
-                            end = start + i + 1
-                            break
-                
-                # Extract chunk
-                chunk = text[start:end].strip()
-                if chunk:
-                    chunks.append(chunk)
-                
-                # Move start position (with overlap)
-                start = end - chunk_overlap if end < text_length else text_length
-            
-            return chunks
+            return list(self._iter_chunks([text], chunk_size, chunk_overlap))
             
         except Exception as e:
-            logging.error(f"Error chunking text: {str(e)}")
+            logger.exception("Error chunking text: %s", e)
             return [text]  # Return original text as single chunk
     
     def delete_document_chunks(self, document_id: str) -> bool:
@@ -285,24 +646,25 @@ class RAGService:
             bool: True if deletion was successful
         """
         try:
-            # Query for chunks with the document ID
-            results = self.collection.get(
-                where={"document_id": document_id},
-                include=['ids']
-            )
-            
-            if results['ids']:
-                # Delete the chunks
-                self.collection.delete(ids=results['ids'])
-                logging.info(f"Deleted {len(results['ids'])} chunks for document {document_id}")
-                return True
-            
-            return True  # No chunks to delete is also success
+            # Only fetch the matching IDs when the count will actually be logged
+            if logger.isEnabledFor(logging.INFO):
+                count = len(self.collection.get(where={"document_id": document_id}, include=[])['ids'])
+                logger.info("Deleting %s chunks for document %s", count, document_id)
+            
+            # Delete the chunks in one call (no chunks to delete is also success)
+            self.collection.delete(where={"document_id": document_id})
+            self._clear_search_caches()
+            return True
             
         except Exception as e:
-            logging.error(f"Error deleting document chunks for {document_id}: {str(e)}")
+            logger.exception("Error deleting document chunks for %s: %s", document_id, e)
             return False
     
+    def _clear_search_caches(self):
+        """Forget cached search results after the collection changes."""
+        self._search_cache.clear()
+        self._semantic_cache.clear()
+    
     def get_collection_stats(self) -> Dict:
         """
         Get statistics about the vector database collection.
@@ -318,5 +680,5 @@ class RAGService:
             }
             
         except Exception as e:
-            logging.error(f"Error getting collection stats: {str(e)}")
+            logger.exception("Error getting collection stats: %s", e)
             return {'total_chunks': 0, 'collection_name': 'unknown'} 
\ No newline at end of file
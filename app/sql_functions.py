@@ -0,0 +1,23 @@
+from sqlalchemy import String
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
+
+class iso_timestamp(FunctionElement):
+    """Render a DateTime column as an ISO 8601 string on the database side."""
+    
+    type = String()
+    name = 'iso_timestamp'
+    inherit_cache = True
+
+@compiles(iso_timestamp)
+def _iso_timestamp_default(element, compiler, **kw):
+    return "CAST(%s AS VARCHAR)" % compiler.process(element.clauses, **kw)
+
+@compiles(iso_timestamp, 'postgresql')
+def _iso_timestamp_postgresql(element, compiler, **kw):
+    return "to_char(%s, 'YYYY-MM-DD\"T\"HH24:MI:SS.US')" % compiler.process(element.clauses, **kw)
+
+@compiles(iso_timestamp, 'sqlite')
+def _iso_timestamp_sqlite(element, compiler, **kw):
+    # SQLAlchemy stores SQLite datetimes as 'YYYY-MM-DD HH:MM:SS.ffffff'
+    return "replace(%s, ' ', 'T')" % compiler.process(element.clauses, **kw)
@@ -1,5 +1,6 @@
 import os
 from dotenv import load_dotenv
+from sqlalchemy.engine import make_url
 
 load_dotenv(override=True)
 
@@ -11,6 +12,15 @@ class Config:
     # Database Configuration
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///university_chatbot.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'query_cache_size': 1200,  # compiled statement cache (default 500)
+        'pool_pre_ping': True
+    }
+    
+    # Connection pool sizing (ignored for SQLite)
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE') or 20)
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW') or 40)
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE') or 1800)
     
     # Supabase Configuration
     SUPABASE_URL = os.environ.get('SUPABASE_URL')
@@ -26,18 +36,104 @@ class Config:
     # Vector Database Configuration
     VECTOR_DB_PATH = os.environ.get('VECTOR_DB_PATH') or './vector_db'
     
+    # Run one query at startup so the first user search doesn't pay for loading the index
+    WARM_VECTOR_INDEX = (os.environ.get('WARM_VECTOR_INDEX') or 'true').lower() == 'true'
+    
     # RAG Configuration
     CHUNK_SIZE = 1000
     CHUNK_OVERLAP = 200
+    MIN_CHUNK_CHARS = 40  # shorter chunks (stray headers, page numbers) are not embedded
     TOP_K_RESULTS = 5
+    CHROMA_ADD_BATCH_SIZE = 200  # ids per collection.add call
+    
+    # Embedding model settings; device defaults to CUDA when available
+    EMBEDDING_DEVICE = os.environ.get('EMBEDDING_DEVICE')
+    EMBEDDING_BATCH_SIZE = 64
+    
+    # Local inference backend: 'torch' or 'onnx' (requires optimum[onnxruntime]); the ONNX
+    # file may name one of the model's int8 exports, e.g. onnx/model_qint8_avx512_vnni.onnx
+    EMBEDDING_BACKEND = os.environ.get('EMBEDDING_BACKEND') or 'torch'
+    EMBEDDING_ONNX_FILE = os.environ.get('EMBEDDING_ONNX_FILE')
+    
+    # Optional shared embedding server (text-embeddings-inference /embed endpoint);
+    # when set, the local model is not loaded
+    EMBEDDING_SERVICE_URL = os.environ.get('EMBEDDING_SERVICE_URL')
+    EMBEDDING_SERVICE_BATCH_SIZE = 32
+    EMBEDDING_SERVICE_TIMEOUT = 30  # seconds
+    
+    # Cache of vector search results, cleared whenever documents are added or removed
+    SEARCH_CACHE_SIZE = 1024
+    SEARCH_CACHE_TTL = 300  # seconds; bounds staleness across worker processes
+    SEMANTIC_CACHE_THRESHOLD = 0.95  # cosine similarity for reusing a near-duplicate query's results
+    
+    # Background threads used to process uploaded documents
+    DOCUMENT_WORKERS = int(os.environ.get('DOCUMENT_WORKERS') or 2)
+    
+    # Process uploads on those threads and answer 202 right away. Off on AWS Lambda,
+    # which freezes the container after the response, so uploads are processed inline.
+    PROCESS_UPLOADS_IN_BACKGROUND = (
+        os.environ.get('PROCESS_UPLOADS_IN_BACKGROUND')
+        or ('false' if os.environ.get('AWS_LAMBDA_FUNCTION_NAME') else 'true')
+    ).lower() == 'true'
+    
+    # Seconds without a heartbeat from its processing run (refreshed every third of
+    # this) after which an unprocessed upload is assumed abandoned (worker died) and
+    # a re-upload of the same file processes it again
+    DOCUMENT_PROCESSING_TIMEOUT = 900
+    
+    # Processes used to extract text from large PDFs (1 disables the pool); smaller
+    # documents are extracted inline
+    PDF_EXTRACT_WORKERS = int(os.environ.get('PDF_EXTRACT_WORKERS') or os.cpu_count() or 1)
+    PDF_PAGES_PER_TASK = 5
+    PDF_PARALLEL_MIN_PAGES = 200
     
     # Chatbot Configuration
     MAX_CONVERSATION_HISTORY = 10
     
+    # Cache of generated answers keyed by question + retrieved context
+    RAG_RESPONSE_CACHE_SIZE = 10000
+    RAG_RESPONSE_CACHE_TTL = 3600  # seconds; bounds staleness after document changes
+    # Let chat requests skip the RAG response cache with "no_cache": true (debugging only)
+    ALLOW_RAG_CACHE_BYPASS = (os.environ.get('ALLOW_RAG_CACHE_BYPASS') or 'false').lower() == 'true'
+    
+    # Cache of AI program extractions keyed by normalized message
+    PROGRAM_EXTRACTION_CACHE_SIZE = 1024
+    PROGRAM_EXTRACTION_CACHE_TTL = 86400  # seconds
+    
+    # Listing pagination
+    PAGE_SIZE_DEFAULT = 50
+    PAGE_SIZE_MAX = 200
+    
+    # Seconds to cache the university info record in-process
+    UNIVERSITY_INFO_CACHE_TTL = 60
+    
+    # Load RAG/Gemini services in a background thread whenever an app is created.
+    # Off by default so CLI commands don't load models; the dev server and the Lambda
+    # handler in app.py warm up anyway, other servers (gunicorn) should set it.
+    PREWARM_SERVICES = (os.environ.get('PREWARM_SERVICES') or 'false').lower() == 'true'
+    
     @staticmethod
     def init_app(app):
         """Initialize application with this configuration."""
-        pass
+        url = make_url(app.config['SQLALCHEMY_DATABASE_URI'])
+        engine_options = dict(app.config['SQLALCHEMY_ENGINE_OPTIONS'])
+        
+        # SQLite uses single-connection pools that reject sizing options
+        if url.get_backend_name() != 'sqlite':
+            engine_options.update(
+                pool_size=app.config['DB_POOL_SIZE'],
+                max_overflow=app.config['DB_MAX_OVERFLOW'],
+                pool_recycle=app.config['DB_POOL_RECYCLE']
+            )
+        
+        # Batched executemany is psycopg2-specific; other drivers reject the option
+        if url.get_driver_name() == 'psycopg2':
+            engine_options.update(
+                executemany_mode='values_plus_batch',
+                insertmanyvalues_page_size=1000
+            )
+        
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options
 
 class DevelopmentConfig(Config):
     """Development configuration."""
@@ -67,6 +163,8 @@ class TestingConfig(Config):
     
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    PREWARM_SERVICES = False
+    WARM_VECTOR_INDEX = False
 
 config = {
     'development': DevelopmentConfig,
@@ -0,0 +1,30 @@
+"""Add file_hash and processing_token to documents
+
+Revision ID: 3f6c2a9d81b4
+Revises: 82029a637e12
+Create Date: 2026-10-15 10:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f6c2a9d81b4'
+down_revision = '82029a637e12'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('documents', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('file_hash', sa.String(length=64), nullable=True))
+        batch_op.add_column(sa.Column('processing_token', sa.String(length=36), nullable=True))
+        batch_op.create_index(batch_op.f('ix_documents_file_hash'), ['file_hash'], unique=True)
+
+
+def downgrade():
+    with op.batch_alter_table('documents', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_documents_file_hash'))
+        batch_op.drop_column('processing_token')
+        batch_op.drop_column('file_hash')
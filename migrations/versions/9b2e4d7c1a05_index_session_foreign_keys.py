@@ -0,0 +1,38 @@
+"""Index session_id foreign keys
+
+Revision ID: 9b2e4d7c1a05
+Revises: 3f6c2a9d81b4
+Create Date: 2026-10-15 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9b2e4d7c1a05'
+down_revision = '3f6c2a9d81b4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('chat_messages', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_chat_messages_session_id'), ['session_id'], unique=False)
+
+    with op.batch_alter_table('applications', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_applications_session_id'), ['session_id'], unique=False)
+
+    with op.batch_alter_table('applicant_data', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_applicant_data_session_id'), ['session_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('applicant_data', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_applicant_data_session_id'))
+
+    with op.batch_alter_table('applications', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_applications_session_id'))
+
+    with op.batch_alter_table('chat_messages', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_chat_messages_session_id'))